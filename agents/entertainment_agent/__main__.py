@@ -7,7 +7,7 @@ class EntertainmentAgent:
         return await execute(payload)
 
 agent = EntertainmentAgent()
-app = create_app(agent)
+app = create_app(agent, agent_name="entertainment")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8002)
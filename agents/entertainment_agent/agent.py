@@ -1,43 +1,191 @@
-import asyncio
 from datetime import datetime
+from typing import Any, Dict, List
+import numpy as np
+from common.config import settings
+from common.geo import extract_coords, haversine_matrix
 
-def generate_itinerary(payload: dict) -> dict:
-    start_date = payload.get("start_date")
-    end_date = payload.get("end_date")
+DEFAULT_ATTRACTION = {"name": "Điểm tham quan mặc định", "description": "Mô tả mặc định"}
+
+def _num_days(payload: dict) -> int:
     try:
-        start = datetime.strptime(start_date, "%Y-%m-%d")
-        end = datetime.strptime(end_date, "%Y-%m-%d")
-        num_days = (end - start).days + 1
+        start = datetime.strptime(payload.get("start_date"), "%Y-%m-%d")
+        end = datetime.strptime(payload.get("end_date"), "%Y-%m-%d")
+        return max(1, (end - start).days + 1)
     except Exception:
-        num_days = 1
+        return 1
+
+def _priority(attraction: Dict[str, Any]) -> float:
+    """Higher for well-rated, much-reviewed attractions; 1.0 when unknown."""
+    rating = attraction.get("rating")
+    reviews = attraction.get("reviews")
+    if not isinstance(rating, (int, float)) or rating <= 0:
+        return 1.0
+    return float(rating) * np.log1p(reviews if isinstance(reviews, (int, float)) and reviews > 0 else 0) + rating
+
+def _visit_hours(attraction: Dict[str, Any]) -> float:
+    hours = attraction.get("visit_hours")
+    return float(hours) if isinstance(hours, (int, float)) and hours > 0 else settings.ITINERARY_VISIT_HOURS
+
+def cluster_by_day(coords: np.ndarray, weights: np.ndarray, num_days: int,
+                   iterations: int = 20) -> np.ndarray:
+    """Assign each point to a day with weighted k-means on (lat, lng).
+
+    Centers start from the highest-weight point and then the points farthest
+    from the chosen centers, so results are deterministic.
+    """
+    n = len(coords)
+    k = min(num_days, n)
+    # Co lat/lng về cùng tỷ lệ km trước khi tính khoảng cách Euclid
+    points = coords * np.array([1.0, np.cos(np.radians(np.nanmean(coords[:, 0])))])
+    centers = [int(np.argmax(weights))]
+    min_dist = np.full(n, np.inf)
+    for _ in range(1, k):
+        min_dist = np.minimum(min_dist, ((points - points[centers[-1]]) ** 2).sum(axis=1))
+        centers.append(int(np.argmax(min_dist)))
+    centers = points[centers]
+
+    labels = None
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        new_labels = np.argmin(distances, axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = labels == c
+            if members.any():
+                centers[c] = np.average(points[members], axis=0, weights=weights[members])
+    return labels
+
+def nearest_neighbour_route(distances: np.ndarray, start: int = 0) -> List[int]:
+    n = len(distances)
+    route = [start]
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    for _ in range(n - 1):
+        candidates = np.where(visited, np.inf, distances[route[-1]])
+        nxt = int(np.argmin(candidates))
+        route.append(nxt)
+        visited[nxt] = True
+    return route
+
+def two_opt(route: List[int], distances: np.ndarray, max_passes: int = 50) -> List[int]:
+    """Improve an open path by segment reversals until no move shortens it.
+
+    A zero-cost dummy node closes the path into a tour, so both ends stay free.
+    """
+    n = len(route)
+    if n < 3:
+        return route
+    padded = np.zeros((n + 1, n + 1))
+    padded[:n, :n] = distances
+    tour = np.array([n] + list(route))
+    m = len(tour)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, m - 1):
+            j = np.arange(i + 1, m)
+            a, b = tour[i - 1], tour[i]
+            c, d = tour[j], tour[(j + 1) % m]
+            delta = padded[a, c] + padded[b, d] - padded[a, b] - padded[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                k = j[best]
+                tour[i:k + 1] = tour[i:k + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return [int(node) for node in tour[1:]]
 
-    attractions = payload.get("attractions", [])
-    if not attractions:
-        attractions = [{"name": "Điểm tham quan mặc định", "description": "Mô tả mặc định"}]
+def _route_hours(route: List[int], distances: np.ndarray, visit_hours: np.ndarray) -> float:
+    travel_km = distances[route[:-1], route[1:]].sum() if len(route) > 1 else 0.0
+    return visit_hours[route].sum() + travel_km / settings.ITINERARY_TRAVEL_SPEED_KMH
 
-    itinerary = []
-    for day in range(1, num_days+1):
-        day_plan = {
-            "day": day,
-            "activities": []
+def plan_day(indices: np.ndarray, distances: np.ndarray, priorities: np.ndarray,
+             visit_hours: np.ndarray) -> List[int]:
+    """Best-priority stops of one cluster that fit the day budget, in visiting order."""
+    budget = settings.ITINERARY_DAY_HOURS
+    ranked = indices[np.argsort(-priorities[indices], kind="stable")]
+    # Chọn trước theo thời gian tham quan, sau đó bỏ dần điểm ít ưu tiên nhất nếu quãng đường làm vượt giờ
+    chosen = ranked[np.cumsum(visit_hours[ranked]) <= budget]
+    if len(chosen) == 0:
+        chosen = ranked[:1]
+    chosen = list(chosen)
+    while True:
+        sub = distances[np.ix_(chosen, chosen)]
+        order = two_opt(nearest_neighbour_route(sub), sub)
+        route = [chosen[i] for i in order]
+        if len(route) == 1 or _route_hours(route, distances, visit_hours) <= budget:
+            return route
+        chosen.pop()
+
+def _clock(hours: float) -> str:
+    total_minutes = int(round(hours * 60))
+    return f"{total_minutes // 60 % 24:02d}:{total_minutes % 60:02d}"
+
+def _day_activities(stops: List[Dict[str, Any]], travel_km: List[float]) -> List[Dict[str, Any]]:
+    clock = settings.ITINERARY_DAY_START_HOUR
+    activities = []
+    for stop, km in zip(stops, travel_km):
+        travel_hours = km / settings.ITINERARY_TRAVEL_SPEED_KMH
+        clock += travel_hours
+        activity = {
+            "time": _clock(clock),
+            "activity": f"Tham quan {stop.get('name', DEFAULT_ATTRACTION['name'])}",
+            "travel_minutes": int(round(travel_hours * 60))
         }
-        # Chọn 1 điểm tham quan theo vòng lặp (round robin)
-        attraction = attractions[(day - 1) % len(attractions)]
-        day_plan["activities"].append({
-            "time": "Sáng",
-            "activity": f"Tham quan {attraction['name']}"
-        })
-        day_plan["activities"].append({
-            "time": "Chiều",
-            "activity": "Tự do tham quan khu vực lân cận"
-        })
-        day_plan["activities"].append({
-            "time": "Tối",
-            "activity": "Dạo phố và khám phá ẩm thực địa phương"
-        })
-        itinerary.append(day_plan)
+        if stop.get("location"):
+            activity["location"] = stop["location"]
+        activities.append(activity)
+        clock += _visit_hours(stop)
+    if len(stops) < 2:
+        activities.append({"time": "Chiều", "activity": "Tự do tham quan khu vực lân cận"})
+    activities.append({"time": "Tối", "activity": "Dạo phố và khám phá ẩm thực địa phương"})
+    return activities
+
+def generate_itinerary(payload: dict) -> dict:
+    num_days = _num_days(payload)
+    attractions = payload.get("attractions", []) or [DEFAULT_ATTRACTION]
+
+    coords = extract_coords(attractions)
+    located = np.where(~np.isnan(coords).any(axis=1))[0]
+    unlocated = [attractions[i] for i in np.where(np.isnan(coords).any(axis=1))[0]]
+
+    days: List[List[Dict[str, Any]]] = [[] for _ in range(num_days)]
+    day_travel: List[List[float]] = [[] for _ in range(num_days)]
+    day_hours = np.zeros(num_days)
+
+    if len(located):
+        located_coords = coords[located]
+        priorities = np.array([_priority(attractions[i]) for i in located])
+        visit_hours = np.array([_visit_hours(attractions[i]) for i in located])
+        distances = haversine_matrix(located_coords, located_coords)
+        labels = cluster_by_day(located_coords, priorities, num_days)
+
+        # Cụm có tổng ưu tiên cao nhất được xếp vào ngày đầu tiên
+        clusters = [np.where(labels == c)[0] for c in range(labels.max() + 1)]
+        clusters = [members for members in clusters if len(members)]
+        clusters.sort(key=lambda members: -priorities[members].sum())
+        for day, members in enumerate(clusters):
+            route = plan_day(members, distances, priorities, visit_hours)
+            days[day] = [attractions[located[i]] for i in route]
+            day_travel[day] = [0.0] + [float(distances[a, b]) for a, b in zip(route[:-1], route[1:])]
+            day_hours[day] = _route_hours(route, distances, visit_hours)
+
+    # Điểm không có toạ độ: xếp vào ngày còn nhiều thời gian nhất
+    for attraction in unlocated:
+        day = int(np.argmin(day_hours))
+        if day_hours[day] + _visit_hours(attraction) > settings.ITINERARY_DAY_HOURS and days[day]:
+            continue
+        days[day].append(attraction)
+        day_travel[day].append(0.0)
+        day_hours[day] += _visit_hours(attraction)
+
+    itinerary = [
+        {"day": day + 1, "activities": _day_activities(days[day], day_travel[day])}
+        for day in range(num_days)
+    ]
     return {"itinerary": itinerary}
 
 async def execute(payload: dict) -> dict:
-    await asyncio.sleep(1)
     return generate_itinerary(payload)
@@ -7,7 +7,7 @@ class MealAgent:
         return await execute(payload)
 
 agent = MealAgent()
-app = create_app(agent)
+app = create_app(agent, agent_name="meal")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8003)
@@ -1,21 +1,53 @@
-import asyncio
+from typing import Any, Dict, List, Optional
+import numpy as np
+from common.geo import extract_coords, haversine_matrix
+
+DEFAULT_RESTAURANT = {"name": "Nhà hàng mặc định", "specialty": ""}
+
+def _pick_nearest(distances: Optional[np.ndarray], used: set, fallback: int) -> int:
+    """Nearest restaurant not used yet on this trip; repeats only when all are used."""
+    if distances is None or np.isnan(distances).all():
+        return fallback
+    order = np.argsort(np.where(np.isnan(distances), np.inf, distances), kind="stable")
+    for index in order:
+        if int(index) not in used and np.isfinite(distances[index]):
+            return int(index)
+    return int(order[0])
 
 def generate_meal_plan(payload: dict) -> dict:
     restaurants = payload.get("restaurants", [])
     itinerary = payload.get("itinerary", [])
     num_days = len(itinerary) if itinerary else 1
+    if not restaurants:
+        restaurants = [DEFAULT_RESTAURANT]
+
+    restaurant_coords = extract_coords(restaurants)
+    has_coords = not np.isnan(restaurant_coords).any(axis=1).all()
+    used: set = set()
     meal_plan = []
     for day in range(1, num_days + 1):
-        restaurant = restaurants[(day - 1) % len(restaurants)] if restaurants else {"name": "Nhà hàng mặc định", "specialty": ""}
+        fallback = (day - 1) % len(restaurants)
+        activities: List[Dict[str, Any]] = itinerary[day - 1].get("activities", []) if itinerary else []
+        stops = extract_coords(activities)
+        stops = stops[~np.isnan(stops).any(axis=1)]
+
+        # Chọn nhà hàng gần điểm tham quan đầu ngày, giữa ngày và cuối ngày
+        picks = {}
+        for meal, stop_index in (("breakfast", 0), ("lunch", len(stops) // 2), ("dinner", -1)):
+            distances = None
+            if has_coords and len(stops):
+                distances = haversine_matrix(stops[[stop_index]], restaurant_coords)[0]
+            picks[meal] = _pick_nearest(distances, used, fallback)
+            used.add(picks[meal])
+
         plan = {
             "day": day,
-            "breakfast": f"Ăn sáng tại {restaurant['name']}",
-            "lunch": f"Ăn trưa tại {restaurant['name']}",
-            "dinner": f"Ăn tối tại {restaurant['name']}"
+            "breakfast": f"Ăn sáng tại {restaurants[picks['breakfast']].get('name', DEFAULT_RESTAURANT['name'])}",
+            "lunch": f"Ăn trưa tại {restaurants[picks['lunch']].get('name', DEFAULT_RESTAURANT['name'])}",
+            "dinner": f"Ăn tối tại {restaurants[picks['dinner']].get('name', DEFAULT_RESTAURANT['name'])}"
         }
         meal_plan.append(plan)
     return {"meals": meal_plan}
 
 async def execute(payload: dict) -> dict:
-    await asyncio.sleep(1)
     return generate_meal_plan(payload)
@@ -1,9 +1,15 @@
 import uvicorn
 from common.a2a_server import create_app
+from common.config import settings
 from task_manager import OrchestratorAgent
 
 agent = OrchestratorAgent()
-app = create_app(agent)
+app = create_app(agent, agent_name="orchestrator", peer_urls=[
+    settings.SEARCH_AGENT_URL,
+    settings.ENTERTAINMENT_AGENT_URL,
+    settings.MEAL_AGENT_URL,
+    settings.STAY_AGENT_URL
+])
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
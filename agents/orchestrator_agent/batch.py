@@ -0,0 +1,176 @@
+"""Bulk trip-plan generation from a JSONL file.
+
+Usage:
+    python -m agents.orchestrator_agent.batch trips.jsonl -o plans.jsonl [--concurrency 8] [--resume]
+
+Each input line is a trip request payload as accepted by ``POST /run``. Every
+output line is ``{"line": n, "ok": bool, "result": ...}`` and is written as
+soon as that plan finishes, so output order follows completion order. The
+output file doubles as the checkpoint: with ``--resume``, lines that already
+succeeded are skipped, failed lines are planned again and new results are
+appended. A line may then appear more than once; its last record wins.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Set, Tuple
+from common.a2a_client import client_pool
+from common.config import settings
+from .task_manager import OrchestratorAgent
+
+logger = logging.getLogger(__name__)
+
+def load_checkpoint(output_path: Path) -> Set[int]:
+    """Line numbers that already have a successful result in ``output_path``.
+
+    Failed lines are left out so a resumed run retries them.
+    """
+    done = set()
+    if not output_path.exists():
+        return done
+    with output_path.open(encoding="utf-8") as f:
+        for raw in f:
+            try:
+                record = json.loads(raw)
+                if record["ok"]:
+                    done.add(record["line"])
+            except (ValueError, KeyError, TypeError):
+                # A partially written last line from an interrupted run
+                continue
+    return done
+
+def iter_requests(input_path: Path, skip: Set[int]) -> Iterator[Tuple[int, str]]:
+    """Yield ``(line_number, raw_line)`` for non-empty lines not in ``skip``."""
+    with input_path.open(encoding="utf-8") as f:
+        for line_number, raw in enumerate(f, start=1):
+            if raw.strip() and line_number not in skip:
+                yield line_number, raw
+
+class BatchStats:
+    def __init__(self, report_every: int):
+        self.report_every = report_every
+        self.started = time.monotonic()
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+
+    @property
+    def processed(self) -> int:
+        return self.succeeded + self.failed
+
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def record(self, ok: bool):
+        if ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        if self.report_every and self.processed % self.report_every == 0:
+            logger.info(f"Processed {self.processed} trips "
+                        f"({self.failed} failed, {self.throughput():.2f} trips/s)")
+
+    def summary(self) -> dict:
+        return {
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "elapsed_seconds": round(time.monotonic() - self.started, 2),
+            "trips_per_second": round(self.throughput(), 3)
+        }
+
+async def run_batch_file(agent: OrchestratorAgent, input_path: Path, output_path: Path,
+                         concurrency: int = 8, resume: bool = False,
+                         report_every: int = 100) -> dict:
+    """Plan every trip in ``input_path`` and append results to ``output_path``."""
+    done = load_checkpoint(output_path) if resume else set()
+    stats = BatchStats(report_every)
+    stats.skipped = len(done)
+    if done:
+        logger.info(f"Resuming: {len(done)} trips already planned in {output_path}")
+
+    # Bounded queue keeps memory flat however large the input file is
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Terminate a line cut off by an interrupted run so appended records stay parseable
+    if resume and output_path.exists() and output_path.stat().st_size:
+        with output_path.open("rb") as f:
+            f.seek(-1, 2)
+            if f.read(1) != b"\n":
+                with output_path.open("a", encoding="utf-8") as out:
+                    out.write("\n")
+
+    with output_path.open("a" if resume else "w", encoding="utf-8") as out:
+
+        def write(record: dict):
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+
+        async def plan(line_number: int, raw: str):
+            try:
+                payload = json.loads(raw)
+                if not isinstance(payload, dict):
+                    raise ValueError("Trip request must be a JSON object")
+                result = await agent.execute(payload)
+                ok = "error" not in result
+            except Exception as e:
+                result = {"error": {"code": "INVALID_REQUEST", "message": str(e)}}
+                ok = False
+            write({"line": line_number, "ok": ok, "result": result})
+            stats.record(ok)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                try:
+                    if item is None:
+                        return
+                    await plan(*item)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for item in iter_requests(input_path, done):
+                await queue.put(item)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    summary = stats.summary()
+    logger.info(f"Batch finished: {summary}")
+    return summary
+
+async def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Generate trip plans in bulk from a JSONL file.")
+    parser.add_argument("input", type=Path, help="JSONL file with one trip request per line")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="JSONL file for results")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Trips planned at once")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip lines that already succeeded in the output file, retry failed ones and append")
+    parser.add_argument("--report-every", type=int, default=100,
+                        help="Log throughput every N trips (0 disables)")
+    args = parser.parse_args(argv)
+
+    agent = OrchestratorAgent()
+    await agent.task_manager.start()
+    try:
+        return await run_batch_file(agent, args.input, args.output, max(1, args.concurrency),
+                                    args.resume, args.report_every)
+    finally:
+        await agent.task_manager.shutdown()
+        await agent.shutdown()
+        await client_pool.shutdown()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    print(json.dumps(asyncio.run(main())))
@@ -1,7 +1,9 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Optional, Tuple
 from enum import Enum
 import logging
+import time
 from common.config import settings
+from common.telemetry import ModelTelemetry, model_telemetry
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +19,20 @@ class TaskType(Enum):
     STAY = "stay"
 
 class ModelSelector:
-    """Selects appropriate model based on task requirements."""
+    """Selects appropriate model based on task requirements.
+
+    Static scores from MODEL_CONFIGS are adjusted with live telemetry once a
+    model has enough recent calls: p95 latency over MODEL_LATENCY_SLO and
+    errors are penalized, cost uses observed tokens per call, and models
+    whose error rate exceeds MODEL_DEGRADED_ERROR_RATE are skipped while a
+    healthy alternative exists. Samples expire after MODEL_TELEMETRY_MAX_AGE,
+    so a skipped model is tried again once its failures have aged out.
+
+    The static part of each score is precomputed per (task type, complexity)
+    and rebuilt only when MODEL_CONFIGS changes. Decisions are memoized per
+    (task type, complexity) for MODEL_SELECTION_CACHE_TTL seconds, so
+    telemetry still shifts traffic without re-scoring on every call.
+    """
     
     # Task type to required strengths mapping
     TASK_REQUIREMENTS = {
@@ -27,13 +42,16 @@ class ModelSelector:
         TaskType.STAY: ["analysis", "structured_output", "travel_planning"]
     }
     
-    def __init__(self):
+    def __init__(self, telemetry: Optional[ModelTelemetry] = None):
         self.model_capabilities = {}
+        self.telemetry = telemetry or model_telemetry
         self._load_model_configs()
         logger.info(f"ModelSelector initialized with {len(self.model_capabilities)} models: {list(self.model_capabilities.keys())}")
 
     def _load_model_configs(self):
-        """Load model configurations from settings."""
+        """Load model configurations from settings and rebuild the score tables."""
+        self._configs_source = settings.MODEL_CONFIGS
+        self.model_capabilities = {}
         for model_name, config in settings.MODEL_CONFIGS.items():
             try:
                 self.model_capabilities[model_name] = {
@@ -46,6 +64,37 @@ class ModelSelector:
             except KeyError as e:
                 logger.error(f"Error loading model {model_name} config: {str(e)}")
                 # Continue loading other models even if one fails
+        self._static_scores = self._build_static_scores()
+        self._decisions: Dict[Tuple[TaskType, TaskComplexity], Tuple[str, float]] = {}
+
+    def reload_configs(self):
+        """Re-read MODEL_CONFIGS, e.g. after it was edited in place."""
+        self._load_model_configs()
+
+    def _build_static_scores(self) -> Dict[Tuple[TaskType, TaskComplexity], Dict[str, Tuple[float, float]]]:
+        """Precompute (fit score, static cost score) per model for every task type and complexity."""
+        tables = {}
+        for task_enum, required_strengths in self.TASK_REQUIREMENTS.items():
+            required_strengths_set = set(required_strengths)
+            for complexity in TaskComplexity:
+                table = {}
+                for model_name, capabilities in self.model_capabilities.items():
+                    # Score based on matching strengths
+                    model_strengths = set(capabilities["strengths"])
+                    strength_match = len(model_strengths & required_strengths_set) / len(required_strengths_set)
+                    fit = strength_match * 0.4  # 40% weight for strength match
+                    
+                    # Score based on complexity match
+                    if capabilities["complexity"] == complexity:
+                        fit += 0.3  # 30% weight for matching complexity
+                    elif capabilities["complexity"].value > complexity.value:
+                        fit += 0.2  # 20% weight for higher complexity
+                    
+                    # Cost efficiency (inverse of cost), normalized by highest cost
+                    cost_score = 1 - (capabilities["cost_per_token"] / 0.03)
+                    table[model_name] = (fit, cost_score)
+                tables[(task_enum, complexity)] = table
+        return tables
 
     def select_model(self, task_type: str, task_data: Dict[str, Any]) -> str:
         """Select the most appropriate model for a given task."""
@@ -62,19 +111,25 @@ class ModelSelector:
                 logger.warning(f"Unknown task type: {task_type}. Using default model.")
                 return settings.DEFAULT_MODEL
                 
-            # Analyze complexity
-            complexity = self._analyze_task_complexity(task_type, task_data)
-            
             # Check if we have required strengths for this task type
             if task_enum not in self.TASK_REQUIREMENTS:
                 logger.warning(f"No strength requirements defined for task type: {task_type}")
                 return settings.DEFAULT_MODEL
-                
-            # Get required strengths for the task
-            required_strengths = self.TASK_REQUIREMENTS[task_enum]
             
+            # Analyze complexity
+            complexity = self._analyze_task_complexity(task_type, task_data)
+            
+            # MODEL_CONFIGS was replaced since the tables were built
+            if settings.MODEL_CONFIGS is not self._configs_source:
+                self._load_model_configs()
+            
+            decision_key = (task_enum, complexity)
+            cached = self._decisions.get(decision_key)
+            if cached is not None and cached[1] > time.monotonic():
+                return cached[0]
+                
             # Score each model based on their suitability for the task
-            model_scores = self._score_models(required_strengths, complexity)
+            model_scores = self._score_models(task_enum, complexity)
             
             if not model_scores:
                 logger.warning("No models scored. Using default model.")
@@ -85,9 +140,13 @@ class ModelSelector:
             
             # Select the model with the highest score
             selected_model = max(model_scores.items(), key=lambda x: x[1])[0]
+            self._decisions[decision_key] = (
+                selected_model, time.monotonic() + settings.MODEL_SELECTION_CACHE_TTL
+            )
             
-            logger.info(f"Selected model {selected_model} for task {task_type} "
-                       f"with complexity {complexity.value}")
+            if cached is None or cached[0] != selected_model:
+                logger.info(f"Selected model {selected_model} for task {task_type} "
+                           f"with complexity {complexity.value}")
             
             return selected_model
                 
@@ -106,34 +165,90 @@ class ModelSelector:
                 logger.error(f"Error selecting fallback model: {str(fallback_error)}")
                 return settings.DEFAULT_MODEL
 
-    def _score_models(self, required_strengths: List[str], 
+    def _score_models(self, task_enum: TaskType,
                      complexity: TaskComplexity) -> Dict[str, float]:
-        """Score models based on their suitability for the task."""
+        """Score models based on their suitability for the task and recent health."""
+        task_type = task_enum.value
         scores = {}
+        observed_costs = self._observed_costs()
+        # Per-call costs are only comparable once at least two models have been observed
+        max_observed_cost = max(observed_costs.values()) if len(observed_costs) > 1 else 0.0
+        degraded = set()
         
-        for model_name, capabilities in self.model_capabilities.items():
-            score = 0.0
-            
-            # Score based on matching strengths
-            model_strengths = set(capabilities["strengths"])
-            required_strengths_set = set(required_strengths)
-            strength_match = len(model_strengths & required_strengths_set) / len(required_strengths_set)
-            score += strength_match * 0.4  # 40% weight for strength match
+        for model_name, (fit, static_cost_score) in self._static_scores[(task_enum, complexity)].items():
+            score = fit
             
-            # Score based on complexity match
-            if capabilities["complexity"] == complexity:
-                score += 0.3  # 30% weight for matching complexity
-            elif capabilities["complexity"].value > complexity.value:
-                score += 0.2  # 20% weight for higher complexity
-            
-            # Score based on cost efficiency (inverse of cost)
-            cost_score = 1 - (capabilities["cost_per_token"] / 0.03)  # Normalize by highest cost
+            # Score based on cost efficiency, per call when token usage is known
+            if model_name in observed_costs and max_observed_cost > 0:
+                cost_score = 1 - (observed_costs[model_name] / max_observed_cost)
+            else:
+                cost_score = static_cost_score
             score += cost_score * 0.3  # 30% weight for cost efficiency
             
+            # Penalize models that are slow or failing right now
+            health = self._model_health(model_name, task_type)
+            if health is not None:
+                p95, error_rate = health["p95"], health["error_rate"]
+                if p95 is not None and p95 > settings.MODEL_LATENCY_SLO:
+                    overshoot = (p95 - settings.MODEL_LATENCY_SLO) / settings.MODEL_LATENCY_SLO
+                    score -= min(overshoot, 1.0) * 0.3
+                score -= error_rate * 0.5
+                if error_rate > settings.MODEL_DEGRADED_ERROR_RATE:
+                    degraded.add(model_name)
+            
             scores[model_name] = score
+        
+        # Shift traffic away from degraded models unless every model is degraded
+        if degraded and len(degraded) < len(scores):
+            logger.info(f"Routing around degraded models: {sorted(degraded)}")
+            scores = {name: score for name, score in scores.items() if name not in degraded}
             
         return scores
 
+    def _telemetry_key(self, model_name: str, task_type: Optional[str]) -> Optional[str]:
+        """Telemetry key with enough samples, preferring per-task over per-model data."""
+        keys = [f"{task_type}:{model_name}", model_name] if task_type else [model_name]
+        for key in keys:
+            if self.telemetry.count(key) >= settings.MODEL_TELEMETRY_MIN_SAMPLES:
+                return key
+        return None
+
+    def _model_health(self, model_name: str, task_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        key = self._telemetry_key(model_name, task_type)
+        if key is None:
+            return None
+        return self.telemetry.snapshot(key)
+
+    def _observed_costs(self) -> Dict[str, float]:
+        """Expected cost per call for models whose token usage has been observed."""
+        costs = {}
+        for model_name, capabilities in self.model_capabilities.items():
+            avg_tokens = self.telemetry.avg_tokens(model_name)
+            if avg_tokens is not None and self._telemetry_key(model_name, None) is not None:
+                costs[model_name] = avg_tokens * capabilities["cost_per_token"]
+        return costs
+
+    def record_outcome(self, task_type: str, model_name: str, latency: float,
+                       success: bool = True, tokens: Optional[int] = None):
+        """Record an LLM call an agent made for ``task_type``.
+
+        Fed from the ``model_calls`` agents return with their results, so
+        only outcomes the model itself produced count; failures of an agent
+        that makes no LLM call would wrongly mark the model as degraded.
+        The call counts for the model overall and for the task type.
+        """
+        self.telemetry.record(model_name, latency, success, tokens)
+        self.telemetry.record(f"{task_type}:{model_name}", latency, success, tokens)
+
+    def get_model_health(self) -> Dict[str, Dict[str, Any]]:
+        """Current telemetry snapshot for every configured model, with per-task detail."""
+        health = {}
+        for name in self.model_capabilities:
+            tasks = {task.value: self.telemetry.snapshot(f"{task.value}:{name}")
+                     for task in TaskType if self.telemetry.count(f"{task.value}:{name}")}
+            health[name] = {**self.telemetry.snapshot(name), "tasks": tasks}
+        return health
+
     def _analyze_task_complexity(self, task_type: str, task_data: Dict[str, Any]) -> TaskComplexity:
         """Analyze the complexity of a task based on its data."""
         # Count the number of requirements/constraints
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Any, List, Callable, Awaitable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+StageFunc = Callable[[Dict[str, Dict[str, Any]]], Awaitable[Dict[str, Any]]]
+StageCallback = Callable[[str, Dict[str, Any]], None]
+
+class Stage:
+    """A single node in the sub-agent call graph."""
+
+    def __init__(self, name: str, func: StageFunc, depends_on: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+
+class StageScheduler:
+    """Runs a DAG of stages, starting each one as soon as its dependencies finish."""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Duplicate stage names in scheduler")
+        self.order = self._topological_order()
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def _topological_order(self) -> List[str]:
+        """Validate the graph and return stage names in dependency order."""
+        in_degree = {name: 0 for name in self.stages}
+        dependents: Dict[str, List[str]] = {name: [] for name in self.stages}
+        for stage in self.stages.values():
+            for dep in stage.depends_on:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage {stage.name} depends on unknown stage {dep}")
+                in_degree[stage.name] += 1
+                dependents[dep].append(stage.name)
+
+        ready = [name for name, degree in in_degree.items() if degree == 0]
+        order = []
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for child in dependents[name]:
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    ready.append(child)
+
+        if len(order) != len(self.stages):
+            raise ValueError("Stage graph contains a cycle")
+        return order
+
+    async def run(self, on_stage_complete: Optional[StageCallback] = None) -> Dict[str, Dict[str, Any]]:
+        """Execute all stages and return their results keyed by stage name.
+
+        ``on_stage_complete`` is called with each stage's name and result as
+        soon as that stage succeeds, before the rest of the graph finishes.
+        """
+        started = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage) -> Dict[str, Any]:
+            inputs = {dep: await tasks[dep] for dep in stage.depends_on}
+            stage_start = time.perf_counter()
+            try:
+                result = await stage.func(inputs)
+                if on_stage_complete is not None:
+                    on_stage_complete(stage.name, result)
+                return result
+            finally:
+                stage_end = time.perf_counter()
+                self.timings[stage.name] = {
+                    "start_ms": round((stage_start - started) * 1000, 2),
+                    "duration_ms": round((stage_end - stage_start) * 1000, 2)
+                }
+                logger.debug(f"Stage {stage.name} finished in "
+                             f"{self.timings[stage.name]['duration_ms']}ms")
+
+        # Dependencies are always created before their dependents
+        for name in self.order:
+            tasks[name] = asyncio.create_task(run_stage(self.stages[name]))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            # Kể cả khi run() bị huỷ (client ngắt kết nối), không để stage nào chạy tiếp ở nền
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            self.timings["total"] = {
+                "start_ms": 0.0,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+            }
+
+        return {name: task.result() for name, task in tasks.items()}
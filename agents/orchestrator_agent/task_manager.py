@@ -1,15 +1,60 @@
 import asyncio
+import hashlib
+import json
 import logging
-from common.a2a_client import call_agent
-from common.base_agent import BaseAgent
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+from common.a2a_client import error_from_result
+from common.base_agent import BaseAgent, ResultCache, TaskManager, ErrorHandler
 from google.adk.tools import google_search
-from common.task_manager import TaskManager
-from common.error_handler import ErrorHandler
 from common.config import settings
+from common.telemetry import LatencyTracker
 from .model_selector import ModelSelector
+from .scheduler import Stage, StageScheduler, StageCallback
+from .transport import TransportRegistry
 
 logger = logging.getLogger(__name__)
 
+# Payload keys that do not change the generated plan
+_NON_PLAN_KEYS = {"task_id", "bypass_cache"}
+
+class PlanRun:
+    """One in-flight plan, shared by every request for the same trip.
+
+    Stage results are kept and fanned out to each streaming subscriber, so a
+    subscriber that joins late still receives the stages finished before it.
+    A ``None`` on a subscriber queue means the plan task has finished.
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.events: List[Tuple[str, dict]] = []
+        self._subscribers: List[asyncio.Queue] = []
+
+    def publish(self, name: str, stage_result: dict):
+        self.events.append((name, stage_result))
+        for queue in self._subscribers:
+            queue.put_nowait((name, stage_result))
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in self.events:
+            queue.put_nowait(event)
+        if self.task.done():
+            queue.put_nowait(None)
+        else:
+            self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def finish(self, task: asyncio.Task):
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+        self._subscribers.clear()
+
 class OrchestratorAgent(BaseAgent):
     def __init__(self):
         super().__init__(
@@ -19,11 +64,119 @@ class OrchestratorAgent(BaseAgent):
         )
         self.task_manager = TaskManager()
         self.model_selector = ModelSelector()
+        # Latency and errors per sub-agent; these agents make no LLM calls, so
+        # their outcomes are kept apart from model telemetry
+        self.agent_health = LatencyTracker(
+            window=settings.MODEL_TELEMETRY_WINDOW,
+            max_age=settings.MODEL_TELEMETRY_MAX_AGE
+        )
+        self.result_cache = ResultCache(
+            ttl=settings.TRIP_RESULT_CACHE_TTL,
+            max_entries=settings.TRIP_RESULT_CACHE_MAX_ENTRIES
+        )
+        # HTTP, in-process or process-pool transport per agent, see AGENT_TRANSPORTS
+        self.transports = TransportRegistry()
+        # Plans being generated, so a retried request (plain or streamed) joins the original run
+        self._inflight_plans: dict[str, PlanRun] = {}
+
+    @staticmethod
+    def _canonicalize(value):
+        """Normalize a payload value so equivalent requests share a cache key."""
+        if isinstance(value, dict):
+            return {k: OrchestratorAgent._canonicalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [OrchestratorAgent._canonicalize(v) for v in value]
+        if isinstance(value, str):
+            return " ".join(value.split())
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+
+    def _trip_cache_key(self, payload: dict) -> str:
+        plan_fields = {k: v for k, v in payload.items() if k not in _NON_PLAN_KEYS}
+        canonical = self._canonicalize(plan_fields)
+        if isinstance(canonical.get("destination"), str):
+            canonical["destination"] = canonical["destination"].casefold()
+        encoded = json.dumps(canonical, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    async def _plan_and_cache(self, cache_key: str, payload: dict,
+                              on_stage_complete: Optional[StageCallback] = None) -> dict:
+        result = await self._plan_trip(payload, on_stage_complete)
+        # Thời gian đo của lần chạy này không đúng cho các lần trả từ cache
+        await self.result_cache.set(cache_key, {k: v for k, v in result.items() if k != "timings"})
+        return result
+
+    def _start_or_join(self, cache_key: str, payload: dict, bypass_cache: bool) -> PlanRun:
+        """The in-flight run for this trip, starting one if none is running."""
+        run = None if bypass_cache else self._inflight_plans.get(cache_key)
+        if run is not None:
+            logger.info(f"Joining in-flight plan for {payload.get('destination')}")
+            return run
+        run = PlanRun()
+        run.task = asyncio.create_task(self._plan_and_cache(cache_key, payload, run.publish))
+        run.task.add_done_callback(run.finish)
+        if not bypass_cache:
+            self._inflight_plans[cache_key] = run
+            run.task.add_done_callback(
+                lambda t: self._inflight_plans.pop(cache_key, None)
+                if self._inflight_plans.get(cache_key) is run else None
+            )
+        return run
 
-    async def _call_agent_with_retry(self, agent_type: str, payload: dict) -> dict:
-        """Call an agent with the appropriate model configuration."""
+    @staticmethod
+    def _stage_event_data(name: str, stage_result: dict) -> dict:
+        """What a stream sends for a stage; search results only as counts."""
+        if name == "search":
+            return {key: len(value) for key, value in stage_result.items() if isinstance(value, list)}
+        return stage_result
+
+    @staticmethod
+    def _cache_hit_result(cached: dict, started: float) -> dict:
+        """A cached plan with timings for this lookup rather than the original run."""
+        return {
+            **cached,
+            "cache": "hit",
+            "timings": {"total": {"start_ms": 0.0,
+                                  "duration_ms": round((time.perf_counter() - started) * 1000, 2)}}
+        }
+
+    def _record_model_calls(self, agent_type: str, result: dict):
+        """Feed the LLM calls an agent reported with its result into model selection."""
+        calls = result.pop("model_calls", None) if isinstance(result, dict) else None
+        for call in calls or []:
+            self.model_selector.record_outcome(agent_type, call["model"], call["latency"],
+                                               call["success"], call.get("tokens"))
+
+    def get_stats(self) -> dict:
+        """Model and sub-agent health plus plan cache counters, for ``GET /stats``."""
+        return {
+            "models": self.model_selector.get_model_health(),
+            "agents": self.get_agent_health(),
+            "result_cache": self.result_cache.get_stats()
+        }
+
+    def get_agent_health(self) -> dict:
+        """Recent latency and error rate of each sub-agent."""
+        return {agent_type: self.agent_health.snapshot(agent_type)
+                for agent_type in ("search", "entertainment", "meal", "stay")}
+
+    async def shutdown(self):
+        """Release transport resources such as the agent process pool."""
+        await self.transports.close()
+
+    async def _call_agent_with_retry(self, agent_type: str, payload: dict,
+                                     models_used: Optional[dict] = None) -> dict:
+        """Call an agent with the appropriate model configuration.
+
+        The selected model is recorded in ``models_used`` under ``agent_type``.
+        An ``{"error": ...}`` result is raised, whichever transport returned it,
+        so the plan fails instead of being cached with a broken section.
+        """
         # Select appropriate model for the task
         model = self.model_selector.select_model(agent_type, payload)
+        if models_used is not None:
+            models_used[agent_type] = model
         model_config = self.model_selector.get_model_config(model)
         
         # Add model configuration to payload
@@ -32,58 +185,144 @@ class OrchestratorAgent(BaseAgent):
             "model_config": model_config
         }
         
-        # Get agent URL from settings based on agent type
-        agent_url = getattr(settings, f"{agent_type.upper()}_AGENT_URL")
-        
+        started = time.monotonic()
         try:
-            return await call_agent(agent_url, agent_payload)
+            result = await self.transports.get(agent_type).call(agent_payload)
+            self._record_model_calls(agent_type, result)
+            # Lỗi trả về dạng {"error": ...} cũng làm hỏng kế hoạch, không được cache
+            error = error_from_result(result)
+            if error is not None:
+                raise error
         except Exception as e:
+            self.agent_health.record(agent_type, time.monotonic() - started, False)
             logger.error(f"Error calling {agent_type} agent: {str(e)}")
             raise
+        self.agent_health.record(agent_type, time.monotonic() - started, True)
+        return result
 
     async def execute(self, payload: dict) -> dict:
         task_id = payload.get("task_id")
         await self.task_manager.create_task(task_id, payload)
-        
+        started = time.perf_counter()
+        bypass_cache = bool(payload.get("bypass_cache"))
+        cache_key = self._trip_cache_key(payload)
+
+        if not bypass_cache:
+            cached = await self.result_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Trip result cache hit for {payload.get('destination')}")
+                result = self._cache_hit_result(cached, started)
+                await self.task_manager.update_task_status(task_id, "completed", result)
+                return result
+
         try:
-            # Gọi Search Agent với model được chọn
-            search_result = await self._call_agent_with_retry("search", payload)
-            
-            # Gọi Entertainment Agent với model được chọn
-            ent_payload = payload.copy()
-            ent_payload.update({"attractions": search_result.get("attractions", [])})
-            entertainment_result = await self._call_agent_with_retry("entertainment", ent_payload)
-            
-            # Gọi Meal Agent với model được chọn
-            meal_payload = payload.copy()
-            meal_payload.update({
-                "restaurants": search_result.get("restaurants", []),
-                "itinerary": entertainment_result.get("itinerary", [])
-            })
-            meal_result = await self._call_agent_with_retry("meal", meal_payload)
-            
-            # Gọi Stay Agent với model được chọn
-            stay_payload = payload.copy()
-            stay_payload.update({"hotels": search_result.get("hotels", [])})
-            stay_result = await self._call_agent_with_retry("stay", stay_payload)
-            
-            # Tổng hợp kết quả từ các agent
-            result = {
-                "itinerary": entertainment_result.get("itinerary", []),
-                "meals": meal_result.get("meals", []),
-                "stays": stay_result.get("stays", {}),
-                "models_used": {  # Track which models were used
-                    "search": self.model_selector.select_model("search", payload),
-                    "entertainment": self.model_selector.select_model("entertainment", ent_payload),
-                    "meal": self.model_selector.select_model("meal", meal_payload),
-                    "stay": self.model_selector.select_model("stay", stay_payload)
-                }
-            }
-            
+            run = self._start_or_join(cache_key, payload, bypass_cache)
+            # Shield so a client disconnect does not abort a plan others are waiting on
+            result = {**await asyncio.shield(run.task), "cache": "miss"}
             await self.task_manager.update_task_status(task_id, "completed", result)
             return result
-            
+
         except Exception as e:
             logger.error(f"Error executing orchestrator task: {str(e)}")
             await self.task_manager.update_task_status(task_id, "failed")
             return await ErrorHandler.handle_error(e)
+
+    async def execute_stream(self, payload: dict) -> AsyncIterator[dict]:
+        """Yield each stage result as it completes, then the final plan.
+
+        Joins an in-flight run for the same trip, whether it was started by
+        ``execute`` or another stream. The search stage is sent as result
+        counts only, since the UI just shows progress for it.
+        """
+        task_id = payload.get("task_id")
+        await self.task_manager.create_task(task_id, payload)
+        started = time.perf_counter()
+        bypass_cache = bool(payload.get("bypass_cache"))
+        cache_key = self._trip_cache_key(payload)
+
+        if not bypass_cache:
+            cached = await self.result_cache.get(cache_key)
+            if cached is not None:
+                result = self._cache_hit_result(cached, started)
+                # Cùng dạng dữ liệu với các stage của một lần lập kế hoạch mới
+                for stage, keys in (("entertainment", ("itinerary",)), ("meal", ("meals",)),
+                                    ("stay", ("stays", "stay_options"))):
+                    yield {"event": "stage", "stage": stage, "data": {key: cached.get(key) for key in keys}}
+                await self.task_manager.update_task_status(task_id, "completed", result)
+                yield {"event": "done", "data": result}
+                return
+
+        run = self._start_or_join(cache_key, payload, bypass_cache)
+        queue = run.subscribe()
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                name, stage_result = item
+                yield {"event": "stage", "stage": name, "data": self._stage_event_data(name, stage_result)}
+        finally:
+            run.unsubscribe(queue)
+
+        try:
+            result = {**run.task.result(), "cache": "miss"}
+            await self.task_manager.update_task_status(task_id, "completed", result)
+            yield {"event": "done", "data": result}
+        except Exception as e:
+            logger.error(f"Error streaming orchestrator task: {str(e)}")
+            await self.task_manager.update_task_status(task_id, "failed")
+            yield {"event": "error", "data": await ErrorHandler.handle_error(e)}
+
+    async def _plan_trip(self, payload: dict,
+                         on_stage_complete: Optional[StageCallback] = None) -> dict:
+        """Run the sub-agent graph for a trip request."""
+        models_used = {}
+
+        async def run_search(inputs: dict) -> dict:
+            return await self._call_agent_with_retry("search", payload, models_used)
+
+        # Gọi Entertainment Agent ngay khi có kết quả tìm kiếm
+        async def run_entertainment(inputs: dict) -> dict:
+            ent_payload = payload.copy()
+            ent_payload.update({"attractions": inputs["search"].get("attractions", [])})
+            return await self._call_agent_with_retry("entertainment", ent_payload, models_used)
+
+        # Meal Agent cần cả nhà hàng và lịch trình
+        async def run_meal(inputs: dict) -> dict:
+            meal_payload = payload.copy()
+            meal_payload.update({
+                "restaurants": inputs["search"].get("restaurants", []),
+                "itinerary": inputs["entertainment"].get("itinerary", [])
+            })
+            return await self._call_agent_with_retry("meal", meal_payload, models_used)
+
+        # Stay Agent chỉ cần danh sách khách sạn, chạy song song với entertainment → meal
+        async def run_stay(inputs: dict) -> dict:
+            stay_payload = payload.copy()
+            stay_payload.update({
+                "hotels": inputs["search"].get("hotels", []),
+                "attractions": inputs["search"].get("attractions", [])
+            })
+            return await self._call_agent_with_retry("stay", stay_payload, models_used)
+
+        scheduler = StageScheduler([
+            Stage("search", run_search),
+            Stage("entertainment", run_entertainment, depends_on=["search"]),
+            Stage("meal", run_meal, depends_on=["search", "entertainment"]),
+            Stage("stay", run_stay, depends_on=["search"])
+        ])
+        stage_results = await scheduler.run(on_stage_complete)
+        entertainment_result = stage_results["entertainment"]
+        meal_result = stage_results["meal"]
+        stay_result = stage_results["stay"]
+
+        # Tổng hợp kết quả từ các agent
+        result = {
+            "itinerary": entertainment_result.get("itinerary", []),
+            "meals": meal_result.get("meals", []),
+            "stays": stay_result.get("stays", {}),
+            "stay_options": stay_result.get("stay_options", []),
+            "models_used": models_used,  # Track which models were used
+            "timings": scheduler.timings
+        }
+        return result
@@ -0,0 +1,127 @@
+import asyncio
+import importlib
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+from common.a2a_client import AgentBatcher, call_agent
+from common.config import settings
+from common.telemetry import run_collecting_model_calls
+
+logger = logging.getLogger(__name__)
+
+# Pure planning functions of the agents that can run inside the orchestrator
+IN_PROCESS_AGENTS = {
+    "entertainment": "agents.entertainment_agent.agent:generate_itinerary",
+    "meal": "agents.meal_agent.agent:generate_meal_plan",
+    "stay": "agents.stay_agent.agent:generate_stay_plan"
+}
+
+def _resolve(path: str) -> Callable[[dict], dict]:
+    module_name, func_name = path.split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+class AgentTransport(ABC):
+    """How the orchestrator reaches one agent: ``call(payload) -> result``.
+
+    LLM calls the agent made for the payload come back as ``model_calls``
+    in the result, whichever transport ran it.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def call(self, payload: dict) -> dict:
+        """Run the agent on ``payload`` and return its result."""
+
+    async def close(self):
+        pass
+
+class HttpTransport(AgentTransport):
+    """POST to the agent's ``/run``, optionally micro-batched via ``/run_batch``."""
+
+    name = "http"
+
+    def __init__(self, base_url: str, batcher: Optional[AgentBatcher] = None):
+        self.base_url = base_url
+        self.batcher = batcher
+
+    async def call(self, payload: dict) -> dict:
+        if self.batcher is not None:
+            return await self.batcher.call(payload)
+        return await call_agent(self.base_url, payload)
+
+class InProcessTransport(AgentTransport):
+    """Call the agent's planning function in this process, skipping HTTP and JSON.
+
+    The function runs in a worker thread so other in-flight plans keep
+    making progress on the event loop while it computes.
+    """
+
+    name = "inprocess"
+
+    def __init__(self, func: Callable[[dict], dict]):
+        self.func = func
+
+    async def call(self, payload: dict) -> dict:
+        return await asyncio.to_thread(run_collecting_model_calls, self.func, payload)
+
+class ProcessPoolTransport(AgentTransport):
+    """Run the agent's planning function in a worker process, off the event loop."""
+
+    name = "process"
+
+    def __init__(self, func: Callable[[dict], dict], executor: ProcessPoolExecutor):
+        self.func = func
+        self.executor = executor
+
+    async def call(self, payload: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, run_collecting_model_calls, self.func, payload)
+
+class TransportRegistry:
+    """Builds and caches one transport per agent type from ``AGENT_TRANSPORTS``."""
+
+    def __init__(self):
+        self._transports: Dict[str, AgentTransport] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def get(self, agent_type: str) -> AgentTransport:
+        transport = self._transports.get(agent_type)
+        if transport is None:
+            transport = self._transports[agent_type] = self._create(agent_type)
+            logger.info(f"Using {transport.name} transport for {agent_type} agent")
+        return transport
+
+    def _create(self, agent_type: str) -> AgentTransport:
+        kind = settings.AGENT_TRANSPORTS.get(agent_type, "http")
+        if kind != "http" and agent_type not in IN_PROCESS_AGENTS:
+            logger.warning(f"{agent_type} agent cannot run in-process. Using HTTP transport.")
+            kind = "http"
+
+        if kind == "inprocess":
+            return InProcessTransport(_resolve(IN_PROCESS_AGENTS[agent_type]))
+        if kind == "process":
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=settings.AGENT_PROCESS_POOL_WORKERS)
+            return ProcessPoolTransport(_resolve(IN_PROCESS_AGENTS[agent_type]), self._executor)
+        if kind != "http":
+            logger.warning(f"Unknown transport {kind} for {agent_type} agent. Using HTTP transport.")
+
+        agent_url = getattr(settings, f"{agent_type.upper()}_AGENT_URL")
+        batcher = None
+        if settings.A2A_BATCHING_ENABLED and agent_type in settings.A2A_BATCH_AGENTS:
+            batcher = AgentBatcher(
+                agent_url,
+                linger_ms=settings.A2A_BATCH_LINGER_MS,
+                max_batch_size=settings.A2A_BATCH_MAX_SIZE
+            )
+        return HttpTransport(agent_url, batcher)
+
+    async def close(self):
+        for transport in self._transports.values():
+            await transport.close()
+        self._transports.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
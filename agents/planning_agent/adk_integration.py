@@ -1,18 +1,28 @@
 from common.base_agent import BaseTool
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, AsyncIterator
+import asyncio
+import json
 import logging
 from common.config import settings
+from .ai_integration import AIClient, get_default_ai_client
+from .optimizer import PlanOptimizer
 
 logger = logging.getLogger(__name__)
 
 class TripPlanningTool(BaseTool):
     """ADK tool for trip planning."""
     
-    def __init__(self):
+    def __init__(self, ai_client: Optional[AIClient] = None):
         super().__init__(
             name="trip_planning",
             description="Plan detailed trip itineraries based on user preferences and constraints"
         )
+        self._ai_client = ai_client
+
+    def _get_ai_client(self) -> AIClient:
+        if self._ai_client is None:
+            self._ai_client = get_default_ai_client()
+        return self._ai_client
 
     async def _execute(self, destination: str, duration: int, preferences: Dict[str, Any], **kwargs) -> Dict[str, Any]:
         """Execute trip planning logic."""
@@ -25,7 +35,7 @@ class TripPlanningTool(BaseTool):
             prompt = self._create_planning_prompt(destination, duration, preferences)
             
             # Generate plan using the model
-            plan = await self.generate_plan(prompt)
+            plan = await self.generate_plan(prompt, cache_scope=self._cache_scope(destination, duration))
             
             return self._process_results(plan)
         except Exception as e:
@@ -58,7 +68,12 @@ class TripPlanningTool(BaseTool):
         5. Estimated costs
         6. Local tips and recommendations
         
-        Format the plan in a clear, structured way.
+        Answer with a single JSON object only, with these keys:
+        - "daily_itinerary": a list of {{"day": number, "activities": [{{"time": "HH:MM",
+          "name": string, "category": string, "duration_hours": number, "estimated_cost": number}}]}}
+        - "recommendations": an object of restaurant, transportation and other suggestions
+        - "estimated_costs": an object of cost category to amount
+        - "local_tips": a list of strings
         """
 
     def _format_preferences(self, preferences: Dict[str, Any]) -> str:
@@ -68,16 +83,64 @@ class TripPlanningTool(BaseTool):
             formatted.append(f"- {key.replace('_', ' ').title()}: {value}")
         return "\n".join(formatted)
 
-    async def generate_plan(self, prompt: str) -> Dict[str, Any]:
-        """Generate trip plan using the model."""
-        # Implement plan generation logic here
-        # This would typically involve calling an LLM
-        return {
+    @staticmethod
+    def _cache_scope(destination: str, duration: int) -> Dict[str, Any]:
+        """Fields a cached completion must match exactly to be reused.
+
+        Planning prompts share one long template, so prompts for different
+        cities or trip lengths are semantically near-identical.
+        """
+        return {"destination": " ".join(destination.split()).casefold(), "duration": duration}
+
+    @staticmethod
+    def _parse_plan(text: str) -> Dict[str, Any]:
+        """Plan dict from the model's answer.
+
+        Tolerates Markdown code fences and text around the JSON object; if
+        no object can be parsed, the answer is kept as ``plan_text``.
+        """
+        plan = {
             "daily_itinerary": [],
             "recommendations": {},
             "estimated_costs": {},
             "local_tips": []
         }
+        start, end = text.find("{"), text.rfind("}")
+        try:
+            parsed = json.loads(text[start:end + 1]) if 0 <= start < end else None
+        except json.JSONDecodeError:
+            parsed = None
+        if not isinstance(parsed, dict):
+            logger.warning("Model answer is not a JSON plan, returning it as text")
+            return {**plan, "plan_text": text}
+        plan.update({key: value for key, value in parsed.items() if value is not None})
+        if not isinstance(plan["daily_itinerary"], list):
+            plan["daily_itinerary"] = []
+        return plan
+
+    async def generate_plan(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Generate trip plan using the model.
+
+        ``kwargs`` are passed to the AI client, e.g. ``cache_scope``.
+        """
+        result = await self._get_ai_client().generate(prompt=prompt, **kwargs)
+        if "error" in result:
+            raise ValueError(f"Plan generation failed: {result['error']}")
+        plan = self._parse_plan(result.get("text") or "")
+        plan["model"] = result.get("model")
+        if result.get("cached"):
+            plan["cached"] = result["cached"]
+        return plan
+
+    async def stream_plan(self, prompt: str, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the plan text from the model as it is generated.
+
+        Yields the chunk schema of ``AIClient.stream``. Pass
+        ``cache_scope=self._cache_scope(destination, duration)`` so a cached
+        plan is only reused for the same trip.
+        """
+        async for chunk in self._get_ai_client().stream(prompt=prompt, **kwargs):
+            yield chunk
 
 class OptimizationTool(BaseTool):
     """ADK tool for optimizing trip plans."""
@@ -88,23 +151,28 @@ class OptimizationTool(BaseTool):
             description="Optimize trip plans for efficiency and user preferences"
         )
 
-    async def _execute(self, plan: Dict[str, Any], constraints: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+    async def _execute(self, plan: Dict[str, Any], constraints: Dict[str, Any],
+                       preferences: Optional[Any] = None, **kwargs) -> Dict[str, Any]:
         """Execute plan optimization logic."""
         try:
-            optimized_plan = await self._optimize_plan(plan, constraints)
+            optimized_plan = await self._optimize_plan(plan, constraints, preferences)
             return self._process_results(optimized_plan)
         except Exception as e:
             self.logger.error(f"Plan optimization failed: {str(e)}")
             return {"error": str(e)}
 
-    async def _optimize_plan(self, plan: Dict[str, Any], constraints: Dict[str, Any]) -> Dict[str, Any]:
-        """Optimize the trip plan based on constraints."""
-        # Implement optimization logic here
-        return {
-            "optimized_itinerary": plan.get("daily_itinerary", []),
-            "optimization_metrics": {
-                "time_efficiency": 0.0,
-                "cost_efficiency": 0.0,
-                "preference_match": 0.0
-            }
-        } 
\ No newline at end of file
+    async def _optimize_plan(self, plan: Dict[str, Any], constraints: Dict[str, Any],
+                             preferences: Optional[Any] = None) -> Dict[str, Any]:
+        """Optimize the trip plan based on constraints.
+
+        ``preferences`` is the request's preferences dict, used when the
+        constraints carry none. The search is CPU-bound and capped by
+        PLAN_OPTIMIZATION_TIME_LIMIT, so it runs in a worker thread to keep
+        the event loop responsive.
+        """
+        if "preferences" not in constraints:
+            preferences = preferences if preferences is not None else plan.get("preferences")
+            if preferences:
+                constraints = {**constraints, "preferences": preferences}
+        optimizer = PlanOptimizer(constraints)
+        return await asyncio.to_thread(optimizer.optimize, plan.get("daily_itinerary", [])) 
\ No newline at end of file
@@ -1,5 +1,6 @@
 from common.base_agent import BaseA2AAgent
 from .adk_integration import TripPlanningTool, OptimizationTool
+from .ai_integration import close_ai_clients
 from typing import Dict, Any, List, Optional
 import logging
 import json
@@ -27,6 +28,14 @@ class PlanningAgent(BaseA2AAgent):
             
         return agent
 
+    async def shutdown(self):
+        """Close the pooled LLM provider connections.
+
+        ``create_app`` calls this from its shutdown hook; other hosts of the
+        agent should call it when they stop.
+        """
+        await close_ai_clients()
+
     async def handle_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """Handle incoming planning requests."""
         try:
@@ -49,7 +58,8 @@ class PlanningAgent(BaseA2AAgent):
             if params.get("constraints"):
                 optimized_plan = await self.tools["trip_optimization"].execute(
                     plan=plan,
-                    constraints=params["constraints"]
+                    constraints=params["constraints"],
+                    preferences=params["preferences"]
                 )
                 if "error" not in optimized_plan:
                     plan = optimized_plan
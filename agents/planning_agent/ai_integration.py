@@ -1,14 +1,211 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+import asyncio
+import functools
+import hashlib
 import httpx
 import json
 import logging
-from .config import settings
+import time
+from common.cache import BoundedCache, PersistentCache
+from common.config import settings
+from common.telemetry import LatencyTracker, record_model_call, total_tokens
 
 logger = logging.getLogger(__name__)
 
+class TokenBucket:
+    """Async token-bucket rate limiter."""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for a while, e.g. after a 429."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+class ProviderLimiter:
+    """Concurrency and rate limits shared by every client of one provider."""
+
+    def __init__(self, max_concurrency: int, requests_per_minute: float, burst: int):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = TokenBucket(requests_per_minute, burst)
+
+def _provider_limits(provider: str) -> Dict[str, Any]:
+    """Derive provider limits from the MODEL_CONFIGS entries served by that provider."""
+    configs = [c for c in settings.MODEL_CONFIGS.values() if c.get("provider") == provider]
+    if not configs:
+        return {"max_concurrency": 4, "requests_per_minute": 60, "burst": 4}
+    return {
+        "max_concurrency": max(c.get("max_concurrency", 4) for c in configs),
+        "requests_per_minute": max(c.get("requests_per_minute", 60) for c in configs),
+        "burst": max(c.get("burst", c.get("max_concurrency", 4)) for c in configs)
+    }
+
+# One pooled HTTP client and limiter per provider, shared across client instances
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+_limiters: Dict[str, ProviderLimiter] = {}
+
+def _get_http_client(provider: str) -> httpx.AsyncClient:
+    client = _http_clients.get(provider)
+    if client is None or client.is_closed:
+        limits = _provider_limits(provider)
+        client = httpx.AsyncClient(
+            timeout=settings.LLM_REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=limits["max_concurrency"],
+                max_keepalive_connections=limits["max_concurrency"],
+                keepalive_expiry=60
+            )
+        )
+        _http_clients[provider] = client
+    return client
+
+def _get_limiter(provider: str) -> ProviderLimiter:
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limits = _provider_limits(provider)
+        limiter = ProviderLimiter(limits["max_concurrency"], limits["requests_per_minute"], limits["burst"])
+        _limiters[provider] = limiter
+    return limiter
+
+async def close_ai_clients():
+    """Close pooled provider connections. Called by ``PlanningAgent.shutdown``."""
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+# Observed latency per provider, used to pick hedge delays
+provider_latency = LatencyTracker()
+
+def tracked(method):
+    """Record latency, outcome and token usage of a generate call in model telemetry."""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        started = time.monotonic()
+        result = await method(self, *args, **kwargs)
+        record_model_call(
+            self.telemetry_model(kwargs, result),
+            time.monotonic() - started,
+            "error" not in result,
+            total_tokens(result.get("usage"))
+        )
+        return result
+    return wrapper
+
 class AIClient(ABC):
     """Abstract base class for AI/LLM clients."""
+
+    provider: str = ""
+
+    model: str = ""
+
+    def served_model(self, kwargs: Dict[str, Any]) -> str:
+        """Model a call is sent to; providers that ignore ``kwargs["model"]`` use their own."""
+        return self.model
+
+    def telemetry_model(self, kwargs: Dict[str, Any], result: Dict[str, Any]) -> str:
+        """Name that a call is attributed to in telemetry.
+
+        The model that actually served the call, as a MODEL_CONFIGS name when
+        one matches (longest prefix, so dated ids like ``gpt-4o-2024-08-06``
+        count for ``gpt-4o``), otherwise the provider's model id as is.
+        """
+        served = result.get("model") or self.served_model(kwargs) or self.provider
+        if served in settings.MODEL_CONFIGS:
+            return served
+        return max(
+            (name for name in settings.MODEL_CONFIGS if served.startswith(name)),
+            key=len,
+            default=served
+        )
+
+    async def _post(self, url: str, **kwargs) -> httpx.Response:
+        """POST through the provider's pooled client, within its concurrency and rate limits."""
+        limiter = _get_limiter(self.provider)
+        await limiter.bucket.acquire()
+        async with limiter.semaphore:
+            response = await _get_http_client(self.provider).post(url, **kwargs)
+        self._check_rate_limit(limiter, response)
+        return response
+
+    def _check_rate_limit(self, limiter: ProviderLimiter, response: httpx.Response):
+        if response.status_code != 429:
+            return
+        retry_after = response.headers.get("retry-after")
+        try:
+            delay = float(retry_after) if retry_after else settings.LLM_RATE_LIMIT_BACKOFF
+        except ValueError:
+            delay = settings.LLM_RATE_LIMIT_BACKOFF
+        logger.warning(f"{self.provider} rate limited, pausing requests for {delay}s")
+        limiter.bucket.pause(delay)
+
+    async def _stream_sse(self, url: str, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """POST a streaming request and yield each decoded SSE ``data:`` payload."""
+        limiter = _get_limiter(self.provider)
+        await limiter.bucket.acquire()
+        async with limiter.semaphore:
+            async with _get_http_client(self.provider).stream("POST", url, **kwargs) as response:
+                self._check_rate_limit(limiter, response)
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if not data or data == "[DONE]":
+                        continue
+                    yield json.loads(data)
+
+    @staticmethod
+    def _to_messages(prompt: Optional[str], messages: Optional[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        if messages:
+            return messages
+        if prompt is None:
+            raise ValueError("Either prompt or messages is required")
+        return [{"role": "user", "content": prompt}]
+
+    async def stream(self, prompt: Optional[str] = None,
+                     messages: Optional[List[Dict[str, str]]] = None,
+                     **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a completion as chunks.
+
+        Yields ``{"type": "delta", "text": ...}`` for each piece of text, then
+        one ``{"type": "done", "model": ..., "usage": {...}}``, or a single
+        ``{"type": "error", "error": ...}`` on failure. Usage is normalized to
+        ``prompt_tokens``, ``completion_tokens`` and ``total_tokens``.
+
+        The default implementation wraps ``generate_with_context`` for clients
+        without a native streaming API.
+        """
+        result = await self.generate_with_context(self._to_messages(prompt, messages), **kwargs)
+        if "error" in result:
+            yield {"type": "error", "error": result["error"]}
+            return
+        yield {"type": "delta", "text": result["text"]}
+        yield {"type": "done", "model": result.get("model"), "usage": result.get("usage", {})}
     
     @abstractmethod
     async def generate(self, prompt: str, **kwargs) -> Dict[str, Any]:
@@ -23,100 +220,147 @@ class AIClient(ABC):
 class OpenAIClient(AIClient):
     """OpenAI API client implementation."""
     
+    provider = "openai"
+
     def __init__(self):
         self.api_key = settings.OPENAI_API_KEY
         self.model = settings.DEFAULT_MODEL
         self.base_url = settings.OPENAI_BASE_URL
+
+    def served_model(self, kwargs: Dict[str, Any]) -> str:
+        return kwargs.get("model", self.model)
         
+    @tracked
     async def generate(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """Generate a response using OpenAI's completion API."""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": kwargs.get("model", self.model),
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": kwargs.get("temperature", settings.TEMPERATURE),
-                        "max_tokens": kwargs.get("max_tokens", settings.MAX_TOKENS)
-                    }
-                )
-                response.raise_for_status()
-                result = response.json()
-                return {
-                    "text": result["choices"][0]["message"]["content"],
-                    "model": result["model"],
-                    "usage": result.get("usage", {})
+            response = await self._post(
+                f"{self.base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": kwargs.get("model", self.model),
+                    "messages": [{"role": "user", "content": prompt}],
+                    "temperature": kwargs.get("temperature", settings.DEFAULT_TEMPERATURE),
+                    "max_tokens": kwargs.get("max_tokens", settings.DEFAULT_MAX_TOKENS)
                 }
+            )
+            response.raise_for_status()
+            result = response.json()
+            return {
+                "text": result["choices"][0]["message"]["content"],
+                "model": result["model"],
+                "usage": result.get("usage", {})
+            }
         except Exception as e:
             logger.error(f"OpenAI API call failed: {str(e)}")
             return {"error": str(e)}
 
+    @tracked
     async def generate_with_context(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
         """Generate a response using conversation context."""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": kwargs.get("model", self.model),
-                        "messages": messages,
-                        "temperature": kwargs.get("temperature", settings.TEMPERATURE),
-                        "max_tokens": kwargs.get("max_tokens", settings.MAX_TOKENS)
-                    }
-                )
-                response.raise_for_status()
-                result = response.json()
-                return {
-                    "text": result["choices"][0]["message"]["content"],
-                    "model": result["model"],
-                    "usage": result.get("usage", {})
+            response = await self._post(
+                f"{self.base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": kwargs.get("model", self.model),
+                    "messages": messages,
+                    "temperature": kwargs.get("temperature", settings.DEFAULT_TEMPERATURE),
+                    "max_tokens": kwargs.get("max_tokens", settings.DEFAULT_MAX_TOKENS)
                 }
+            )
+            response.raise_for_status()
+            result = response.json()
+            return {
+                "text": result["choices"][0]["message"]["content"],
+                "model": result["model"],
+                "usage": result.get("usage", {})
+            }
         except Exception as e:
             logger.error(f"OpenAI API call failed: {str(e)}")
             return {"error": str(e)}
 
+    async def stream(self, prompt: Optional[str] = None,
+                     messages: Optional[List[Dict[str, str]]] = None,
+                     **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a completion using OpenAI's SSE chat completions API."""
+        model = kwargs.get("model", self.model)
+        usage = {}
+        try:
+            async for chunk in self._stream_sse(
+                f"{self.base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": model,
+                    "messages": self._to_messages(prompt, messages),
+                    "temperature": kwargs.get("temperature", settings.DEFAULT_TEMPERATURE),
+                    "max_tokens": kwargs.get("max_tokens", settings.DEFAULT_MAX_TOKENS),
+                    "stream": True,
+                    "stream_options": {"include_usage": True}
+                }
+            ):
+                model = chunk.get("model", model)
+                if chunk.get("usage"):
+                    usage = {
+                        "prompt_tokens": chunk["usage"].get("prompt_tokens", 0),
+                        "completion_tokens": chunk["usage"].get("completion_tokens", 0),
+                        "total_tokens": chunk["usage"].get("total_tokens", 0)
+                    }
+                for choice in chunk.get("choices", []):
+                    text = choice.get("delta", {}).get("content")
+                    if text:
+                        yield {"type": "delta", "text": text}
+            yield {"type": "done", "model": model, "usage": usage}
+        except Exception as e:
+            logger.error(f"OpenAI streaming call failed: {str(e)}")
+            yield {"type": "error", "error": str(e)}
+
 class GeminiClient(AIClient):
     """Google Gemini API client implementation."""
     
+    provider = "gemini"
+
     def __init__(self):
         self.api_key = settings.GEMINI_API_KEY
+        self.model = "gemini-pro"
         self.base_url = settings.GEMINI_BASE_URL
         
+    @tracked
     async def generate(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """Generate a response using Gemini API."""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/models/gemini-pro:generateContent",
-                    params={"key": self.api_key},
-                    json={
-                        "contents": [{"parts": [{"text": prompt}]}],
-                        "generationConfig": {
-                            "temperature": kwargs.get("temperature", settings.TEMPERATURE),
-                            "maxOutputTokens": kwargs.get("max_tokens", settings.MAX_TOKENS)
-                        }
+            response = await self._post(
+                f"{self.base_url}/models/{self.model}:generateContent",
+                params={"key": self.api_key},
+                json={
+                    "contents": [{"parts": [{"text": prompt}]}],
+                    "generationConfig": {
+                        "temperature": kwargs.get("temperature", settings.DEFAULT_TEMPERATURE),
+                        "maxOutputTokens": kwargs.get("max_tokens", settings.DEFAULT_MAX_TOKENS)
                     }
-                )
-                response.raise_for_status()
-                result = response.json()
-                return {
-                    "text": result["candidates"][0]["content"]["parts"][0]["text"],
-                    "model": "gemini-pro",
-                    "usage": {}  # Gemini doesn't provide usage stats in the same way
                 }
+            )
+            response.raise_for_status()
+            result = response.json()
+            return {
+                "text": result["candidates"][0]["content"]["parts"][0]["text"],
+                "model": self.model,
+                "usage": {}  # Gemini doesn't provide usage stats in the same way
+            }
         except Exception as e:
             logger.error(f"Gemini API call failed: {str(e)}")
             return {"error": str(e)}
 
+    @tracked
     async def generate_with_context(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
         """Generate a response using conversation context."""
         try:
@@ -128,65 +372,108 @@ class GeminiClient(AIClient):
                     "parts": [{"text": msg["content"]}]
                 })
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/models/gemini-pro:generateContent",
-                    params={"key": self.api_key},
-                    json={
-                        "contents": contents,
-                        "generationConfig": {
-                            "temperature": kwargs.get("temperature", settings.TEMPERATURE),
-                            "maxOutputTokens": kwargs.get("max_tokens", settings.MAX_TOKENS)
-                        }
+            response = await self._post(
+                f"{self.base_url}/models/{self.model}:generateContent",
+                params={"key": self.api_key},
+                json={
+                    "contents": contents,
+                    "generationConfig": {
+                        "temperature": kwargs.get("temperature", settings.DEFAULT_TEMPERATURE),
+                        "maxOutputTokens": kwargs.get("max_tokens", settings.DEFAULT_MAX_TOKENS)
                     }
-                )
-                response.raise_for_status()
-                result = response.json()
-                return {
-                    "text": result["candidates"][0]["content"]["parts"][0]["text"],
-                    "model": "gemini-pro",
-                    "usage": {}
                 }
+            )
+            response.raise_for_status()
+            result = response.json()
+            return {
+                "text": result["candidates"][0]["content"]["parts"][0]["text"],
+                "model": self.model,
+                "usage": {}
+            }
         except Exception as e:
             logger.error(f"Gemini API call failed: {str(e)}")
             return {"error": str(e)}
 
+    async def stream(self, prompt: Optional[str] = None,
+                     messages: Optional[List[Dict[str, str]]] = None,
+                     **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a completion using Gemini's streamGenerateContent SSE API."""
+        contents = [
+            {
+                "role": "user" if msg["role"] == "user" else "model",
+                "parts": [{"text": msg["content"]}]
+            }
+            for msg in self._to_messages(prompt, messages)
+        ]
+        usage = {}
+        try:
+            async for chunk in self._stream_sse(
+                f"{self.base_url}/models/{self.model}:streamGenerateContent",
+                params={"key": self.api_key, "alt": "sse"},
+                json={
+                    "contents": contents,
+                    "generationConfig": {
+                        "temperature": kwargs.get("temperature", settings.DEFAULT_TEMPERATURE),
+                        "maxOutputTokens": kwargs.get("max_tokens", settings.DEFAULT_MAX_TOKENS)
+                    }
+                }
+            ):
+                metadata = chunk.get("usageMetadata")
+                if metadata:
+                    usage = {
+                        "prompt_tokens": metadata.get("promptTokenCount", 0),
+                        "completion_tokens": metadata.get("candidatesTokenCount", 0),
+                        "total_tokens": metadata.get("totalTokenCount", 0)
+                    }
+                for candidate in chunk.get("candidates", []):
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            yield {"type": "delta", "text": part["text"]}
+            yield {"type": "done", "model": self.model, "usage": usage}
+        except Exception as e:
+            logger.error(f"Gemini streaming call failed: {str(e)}")
+            yield {"type": "error", "error": str(e)}
+
 class ClaudeClient(AIClient):
     """Anthropic Claude API client implementation."""
     
+    provider = "claude"
+
     def __init__(self):
         self.api_key = settings.CLAUDE_API_KEY
+        self.model = "claude-3-sonnet-20240229"
         self.base_url = settings.CLAUDE_BASE_URL
         
+    @tracked
     async def generate(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """Generate a response using Claude API."""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/messages",
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "claude-3-sonnet-20240229",
-                        "messages": [{"role": "user", "content": prompt}],
-                        "max_tokens": kwargs.get("max_tokens", settings.MAX_TOKENS),
-                        "temperature": kwargs.get("temperature", settings.TEMPERATURE)
-                    }
-                )
-                response.raise_for_status()
-                result = response.json()
-                return {
-                    "text": result["content"][0]["text"],
-                    "model": result["model"],
-                    "usage": result.get("usage", {})
+            response = await self._post(
+                f"{self.base_url}/messages",
+                headers={
+                    "x-api-key": self.api_key,
+                    "anthropic-version": "2023-06-01",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": self.model,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "max_tokens": kwargs.get("max_tokens", settings.DEFAULT_MAX_TOKENS),
+                    "temperature": kwargs.get("temperature", settings.DEFAULT_TEMPERATURE)
                 }
+            )
+            response.raise_for_status()
+            result = response.json()
+            return {
+                "text": result["content"][0]["text"],
+                "model": result["model"],
+                "usage": result.get("usage", {})
+            }
         except Exception as e:
             logger.error(f"Claude API call failed: {str(e)}")
             return {"error": str(e)}
 
+    @tracked
     async def generate_with_context(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
         """Generate a response using conversation context."""
         try:
@@ -196,32 +483,362 @@ class ClaudeClient(AIClient):
                 for msg in messages
             ]
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/messages",
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "claude-3-sonnet-20240229",
-                        "messages": claude_messages,
-                        "max_tokens": kwargs.get("max_tokens", settings.MAX_TOKENS),
-                        "temperature": kwargs.get("temperature", settings.TEMPERATURE)
-                    }
-                )
-                response.raise_for_status()
-                result = response.json()
-                return {
-                    "text": result["content"][0]["text"],
-                    "model": result["model"],
-                    "usage": result.get("usage", {})
+            response = await self._post(
+                f"{self.base_url}/messages",
+                headers={
+                    "x-api-key": self.api_key,
+                    "anthropic-version": "2023-06-01",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": self.model,
+                    "messages": claude_messages,
+                    "max_tokens": kwargs.get("max_tokens", settings.DEFAULT_MAX_TOKENS),
+                    "temperature": kwargs.get("temperature", settings.DEFAULT_TEMPERATURE)
                 }
+            )
+            response.raise_for_status()
+            result = response.json()
+            return {
+                "text": result["content"][0]["text"],
+                "model": result["model"],
+                "usage": result.get("usage", {})
+            }
         except Exception as e:
             logger.error(f"Claude API call failed: {str(e)}")
             return {"error": str(e)}
 
+    async def stream(self, prompt: Optional[str] = None,
+                     messages: Optional[List[Dict[str, str]]] = None,
+                     **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a completion using Claude's SSE messages API."""
+        model = self.model
+        input_tokens = output_tokens = 0
+        try:
+            async for event in self._stream_sse(
+                f"{self.base_url}/messages",
+                headers={
+                    "x-api-key": self.api_key,
+                    "anthropic-version": "2023-06-01",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": model,
+                    "messages": [
+                        {"role": msg["role"], "content": msg["content"]}
+                        for msg in self._to_messages(prompt, messages)
+                    ],
+                    "max_tokens": kwargs.get("max_tokens", settings.DEFAULT_MAX_TOKENS),
+                    "temperature": kwargs.get("temperature", settings.DEFAULT_TEMPERATURE),
+                    "stream": True
+                }
+            ):
+                event_type = event.get("type")
+                if event_type == "message_start":
+                    message = event.get("message", {})
+                    model = message.get("model", model)
+                    input_tokens = message.get("usage", {}).get("input_tokens", 0)
+                elif event_type == "content_block_delta":
+                    text = event.get("delta", {}).get("text")
+                    if text:
+                        yield {"type": "delta", "text": text}
+                elif event_type == "message_delta":
+                    output_tokens = event.get("usage", {}).get("output_tokens", output_tokens)
+                elif event_type == "error":
+                    raise RuntimeError(event.get("error", {}).get("message", "Claude stream error"))
+            yield {
+                "type": "done",
+                "model": model,
+                "usage": {
+                    "prompt_tokens": input_tokens,
+                    "completion_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens
+                }
+            }
+        except Exception as e:
+            logger.error(f"Claude streaming call failed: {str(e)}")
+            yield {"type": "error", "error": str(e)}
+
+class FallbackAIClient(AIClient):
+    """Composite client that tries providers in priority order.
+
+    A provider that errors or exceeds ``timeout`` hands over to the next one.
+    With ``hedge`` enabled, the next provider is also started once the
+    current one runs past its observed p95 latency, and the first good
+    response wins.
+    """
+
+    def __init__(self, clients: List[AIClient], timeout: float = settings.LLM_PROVIDER_TIMEOUT,
+                 hedge: bool = settings.LLM_HEDGE_ENABLED,
+                 latency_tracker: Optional[LatencyTracker] = None):
+        if not clients:
+            raise ValueError("FallbackAIClient needs at least one client")
+        self.clients = clients
+        self.timeout = timeout
+        self.hedge = hedge
+        self.latency = latency_tracker or provider_latency
+        self.provider = "fallback:" + ",".join(client.provider for client in clients)
+
+    def _hedge_delay(self, client: AIClient) -> float:
+        """Wait this long for ``client`` before starting the next provider."""
+        if self.latency.count(client.provider) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return settings.LLM_HEDGE_DEFAULT_DELAY
+        return self.latency.percentile(client.provider, settings.LLM_HEDGE_PERCENTILE)
+
+    async def _timed_call(self, client: AIClient, call) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(call(client), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            result = {"error": f"timed out after {self.timeout}s"}
+        except Exception as e:
+            result = {"error": str(e)}
+        self.latency.record(client.provider, time.monotonic() - started, "error" not in result)
+        return result
+
+    async def _execute(self, call) -> Dict[str, Any]:
+        remaining = list(self.clients)
+        pending: Dict[asyncio.Task, AIClient] = {}
+        errors = []
+        last_started: Optional[AIClient] = None
+
+        def launch():
+            nonlocal last_started
+            last_started = remaining.pop(0)
+            pending[asyncio.create_task(self._timed_call(last_started, call))] = last_started
+
+        try:
+            while pending or remaining:
+                if not pending:
+                    launch()
+                hedge_delay = self._hedge_delay(last_started) if self.hedge and remaining else None
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.info(f"Hedging: {last_started.provider} slower than {hedge_delay:.2f}s, "
+                                f"starting {remaining[0].provider}")
+                    launch()
+                    continue
+                for task in done:
+                    client = pending.pop(task)
+                    result = task.result()
+                    if "error" not in result:
+                        return {**result, "provider": client.provider}
+                    logger.warning(f"{client.provider} failed, falling back: {result['error']}")
+                    errors.append(f"{client.provider}: {result['error']}")
+        finally:
+            for task in pending:
+                task.cancel()
+        return {"error": "All AI providers failed: " + "; ".join(errors)}
+
+    async def generate(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await self._execute(lambda client: client.generate(prompt, **kwargs))
+
+    async def generate_with_context(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        return await self._execute(lambda client: client.generate_with_context(messages, **kwargs))
+
+    async def stream(self, prompt: Optional[str] = None,
+                     messages: Optional[List[Dict[str, str]]] = None,
+                     **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Fail over until a provider produces its first chunk; no hedging once streaming."""
+        errors = []
+        for client in self.clients:
+            started = time.monotonic()
+            chunks = client.stream(prompt=prompt, messages=messages, **kwargs)
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+            except StopAsyncIteration:
+                continue
+            except Exception as e:
+                first = {"type": "error", "error": str(e) or "timed out"}
+            if first["type"] == "error":
+                await chunks.aclose()
+                self.latency.record(client.provider, time.monotonic() - started, False)
+                errors.append(f"{client.provider}: {first['error']}")
+                continue
+            yield first
+            async for chunk in chunks:
+                if chunk["type"] == "done":
+                    self.latency.record(client.provider, time.monotonic() - started, True)
+                    chunk = {**chunk, "provider": client.provider}
+                yield chunk
+            return
+        yield {"type": "error", "error": "All AI providers failed: " + "; ".join(errors)}
+
+class MemoryCompletionStore:
+    """In-process LRU store for exact-match completions."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self._cache = BoundedCache(ttl_seconds=ttl_seconds, max_entries=max_entries)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        self._cache.set(key, value)
+
+class DiskCompletionStore:
+    """SQLite store under ./cache, shared across restarts and processes."""
+
+    def __init__(self, db_path: str, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self._cache = PersistentCache(db_path, max_entries=max_entries)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        stored = await asyncio.to_thread(self._cache.get, key)
+        return stored[0] if stored is not None else None
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        await asyncio.to_thread(self._cache.set, key, value, self.ttl_seconds)
+
+class ExactCompletionCache:
+    """Completion cache keyed on a hash of the full request.
+
+    The key covers provider, model, messages, temperature and max_tokens,
+    so only byte-identical requests share an entry. ``store`` is any object
+    with async ``get(key)`` and ``set(key, value)``.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def make_key(scope: str, messages: List[Dict[str, str]]) -> str:
+        encoded = json.dumps({"scope": scope, "messages": messages}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    async def get(self, scope: str, messages: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        cached = await self.store.get(self.make_key(scope, messages))
+        self.stats["hits" if cached is not None else "misses"] += 1
+        return cached
+
+    async def set(self, scope: str, messages: List[Dict[str, str]], value: Dict[str, Any]):
+        await self.store.set(self.make_key(scope, messages), value)
+        self.stats["stores"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0}
+
+class CachedAIClient(AIClient):
+    """Wraps an AIClient with completion caches.
+
+    The exact-match cache serves requests with temperature 0, or any request
+    made with ``cache_exact=True``. The semantic cache serves single-prompt
+    requests. Pass ``use_cache=False`` to skip both for a single call.
+
+    Prompts rendered from one template can be near-identical while asking
+    about different things, e.g. another destination. Callers pass those
+    fields as ``cache_scope={"destination": ..., "duration": ...}``; they
+    become part of the scope, so a semantic hit needs them to match exactly.
+    """
+
+    def __init__(self, client: AIClient, semantic_cache=None,
+                 exact_cache: Optional[ExactCompletionCache] = None):
+        self.client = client
+        self.provider = client.provider
+        self.semantic_cache = semantic_cache
+        self.exact_cache = exact_cache
+
+    def _scope(self, kwargs: Dict[str, Any]) -> str:
+        """Cache scope: only completions for the same model, parameters and
+        ``cache_scope`` fields are reused. Pops ``cache_scope`` from kwargs."""
+        return json.dumps({
+            "provider": self.provider,
+            "model": kwargs.get("model", getattr(self.client, "model", None)),
+            "temperature": kwargs.get("temperature", settings.DEFAULT_TEMPERATURE),
+            "max_tokens": kwargs.get("max_tokens", settings.DEFAULT_MAX_TOKENS),
+            "fields": kwargs.pop("cache_scope", None) or {}
+        }, sort_keys=True, ensure_ascii=False, default=str)
+
+    def _cache_options(self, kwargs: Dict[str, Any]) -> Tuple[bool, bool]:
+        """Pop cache flags from kwargs and return (use_cache, use_exact)."""
+        use_cache = kwargs.pop("use_cache", True)
+        opted_in = kwargs.pop("cache_exact", False)
+        deterministic = kwargs.get("temperature", settings.DEFAULT_TEMPERATURE) == 0
+        use_exact = use_cache and self.exact_cache is not None and (opted_in or deterministic)
+        return use_cache, use_exact
+
+    async def _lookup(self, messages: List[Dict[str, str]], prompt: Optional[str],
+                      scope: str, use_exact: bool) -> Optional[Dict[str, Any]]:
+        if use_exact:
+            cached = await self.exact_cache.get(scope, messages)
+            if cached is not None:
+                return {**cached, "cached": "exact"}
+        if prompt is not None and self.semantic_cache is not None:
+            cached = await self.semantic_cache.get(prompt, scope)
+            if cached is not None:
+                return {**cached, "cached": "semantic"}
+        return None
+
+    async def _store(self, messages: List[Dict[str, str]], prompt: Optional[str],
+                     scope: str, use_exact: bool, result: Dict[str, Any]):
+        if use_exact:
+            await self.exact_cache.set(scope, messages, result)
+        if prompt is not None and self.semantic_cache is not None:
+            await self.semantic_cache.set(prompt, scope, result)
+
+    async def _cached_call(self, messages: List[Dict[str, str]], prompt: Optional[str],
+                           kwargs: Dict[str, Any], call) -> Dict[str, Any]:
+        use_cache, use_exact = self._cache_options(kwargs)
+        scope = self._scope(kwargs)
+        if not use_cache:
+            return await call(**kwargs)
+        cached = await self._lookup(messages, prompt, scope, use_exact)
+        if cached is not None:
+            return cached
+        result = await call(**kwargs)
+        if "error" not in result:
+            await self._store(messages, prompt, scope, use_exact, result)
+        return result
+
+    async def generate(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await self._cached_call(
+            self._to_messages(prompt, None), prompt, kwargs,
+            lambda **kw: self.client.generate(prompt, **kw)
+        )
+
+    async def generate_with_context(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        # Multi-turn context is only reused on an exact match
+        return await self._cached_call(
+            messages, None, kwargs,
+            lambda **kw: self.client.generate_with_context(messages, **kw)
+        )
+
+    async def stream(self, prompt: Optional[str] = None,
+                     messages: Optional[List[Dict[str, str]]] = None,
+                     **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        use_cache, use_exact = self._cache_options(kwargs)
+        request_messages = self._to_messages(prompt, messages)
+        semantic_prompt = prompt if not messages else None
+        scope = self._scope(kwargs)
+        if use_cache:
+            cached = await self._lookup(request_messages, semantic_prompt, scope, use_exact)
+            if cached is not None:
+                yield {"type": "delta", "text": cached["text"]}
+                yield {"type": "done", "model": cached.get("model"), "usage": cached.get("usage", {}),
+                       "cached": cached["cached"]}
+                return
+
+        parts = []
+        async for chunk in self.client.stream(prompt=prompt, messages=messages, **kwargs):
+            if chunk["type"] == "delta":
+                parts.append(chunk["text"])
+            elif chunk["type"] == "done" and use_cache:
+                await self._store(request_messages, semantic_prompt, scope, use_exact, {
+                    "text": "".join(parts), "model": chunk.get("model"), "usage": chunk.get("usage", {})
+                })
+            yield chunk
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        stats = {}
+        if self.exact_cache is not None:
+            stats["exact"] = self.exact_cache.get_stats()
+        if self.semantic_cache is not None:
+            stats["semantic"] = self.semantic_cache.get_stats()
+        return stats
+
 class AIClientFactory:
     """Factory class for creating AI clients."""
     
@@ -237,15 +854,76 @@ class AIClientFactory:
         else:
             raise ValueError(f"Unsupported AI provider: {provider}")
 
+_semantic_cache = None
+
+def get_semantic_cache():
+    """Return the process-wide semantic cache, or None when it is disabled."""
+    global _semantic_cache
+    if not settings.LLM_SEMANTIC_CACHE_ENABLED:
+        return None
+    if _semantic_cache is None:
+        from .semantic_cache import SemanticCache
+        _semantic_cache = SemanticCache(
+            model_name=settings.LLM_SEMANTIC_CACHE_MODEL,
+            threshold=settings.LLM_SEMANTIC_CACHE_THRESHOLD,
+            max_entries=settings.LLM_SEMANTIC_CACHE_MAX_ENTRIES
+        )
+    return _semantic_cache
+
+_exact_cache: Optional[ExactCompletionCache] = None
+
+def get_exact_cache() -> Optional[ExactCompletionCache]:
+    """Return the process-wide exact-match cache, or None when it is disabled."""
+    global _exact_cache
+    if not settings.LLM_EXACT_CACHE_ENABLED:
+        return None
+    if _exact_cache is None:
+        if settings.LLM_EXACT_CACHE_BACKEND == "disk":
+            store = DiskCompletionStore(
+                settings.LLM_EXACT_CACHE_DB_PATH,
+                ttl_seconds=settings.LLM_EXACT_CACHE_TTL,
+                max_entries=settings.LLM_EXACT_CACHE_MAX_ENTRIES
+            )
+        elif settings.LLM_EXACT_CACHE_BACKEND == "memory":
+            store = MemoryCompletionStore(
+                ttl_seconds=settings.LLM_EXACT_CACHE_TTL,
+                max_entries=settings.LLM_EXACT_CACHE_MAX_ENTRIES
+            )
+        else:
+            raise ValueError(f"Unsupported LLM exact cache backend: {settings.LLM_EXACT_CACHE_BACKEND}")
+        _exact_cache = ExactCompletionCache(store)
+    return _exact_cache
+
+def _with_caches(client: AIClient) -> AIClient:
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None and not semantic_cache.enabled:
+        semantic_cache = None
+    exact_cache = get_exact_cache()
+    if semantic_cache is None and exact_cache is None:
+        return client
+    return CachedAIClient(client, semantic_cache=semantic_cache, exact_cache=exact_cache)
+
+_PROVIDER_KEYS = {
+    "openai": "OPENAI_API_KEY",
+    "gemini": "GEMINI_API_KEY",
+    "claude": "CLAUDE_API_KEY"
+}
+
 # Helper function to get default AI client
 def get_default_ai_client() -> AIClient:
-    """Get the default AI client based on configuration."""
-    # You can modify this logic based on your preferences
-    if settings.OPENAI_API_KEY:
-        return AIClientFactory.create_client("openai")
-    elif settings.GEMINI_API_KEY:
-        return AIClientFactory.create_client("gemini")
-    elif settings.CLAUDE_API_KEY:
-        return AIClientFactory.create_client("claude")
-    else:
-        raise ValueError("No AI provider API keys configured")
\ No newline at end of file
+    """Get the default AI client based on configuration.
+
+    Configured providers are tried in LLM_PROVIDER_PRIORITY order; with more
+    than one configured and fallback enabled they are combined into a
+    FallbackAIClient.
+    """
+    providers = [
+        provider for provider in settings.LLM_PROVIDER_PRIORITY
+        if getattr(settings, _PROVIDER_KEYS.get(provider, ""), "")
+    ]
+    if not providers:
+        raise ValueError("No AI provider API keys configured")
+    if len(providers) == 1 or not settings.LLM_FALLBACK_ENABLED:
+        return _with_caches(AIClientFactory.create_client(providers[0]))
+    clients = [AIClientFactory.create_client(provider) for provider in providers]
+    return _with_caches(FallbackAIClient(clients))
\ No newline at end of file
@@ -0,0 +1,306 @@
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from common.config import settings
+from common.geo import extract_coords, haversine_matrix
+
+logger = logging.getLogger(__name__)
+
+class PlanItem:
+    """One schedulable activity of a plan, normalized from its dict form."""
+
+    __slots__ = ("index", "source", "name", "duration", "cost", "opens", "closes", "value", "matches")
+
+    def __init__(self, index: int, source: Dict[str, Any], duration: float, cost: float,
+                 opens: float, closes: float, value: float, matches: bool):
+        self.index = index
+        self.source = source
+        self.name = source.get("name") or source.get("activity") or ""
+        self.duration = duration
+        self.cost = cost
+        self.opens = opens
+        self.closes = closes
+        self.value = value
+        self.matches = matches
+
+def parse_hour(value: Any) -> Optional[float]:
+    """``"08:30"`` or ``8.5`` to hours since midnight; None if not a clock time."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str) and ":" in value:
+        try:
+            hours, minutes = value.strip().split(":")[:2]
+            return int(hours) + int(minutes) / 60
+        except ValueError:
+            return None
+    return None
+
+def _first_number(source: Dict[str, Any], keys: Tuple[str, ...]) -> Optional[float]:
+    """First of ``keys`` holding a number or a numeric string such as ``"300"``."""
+    for key in keys:
+        value = source.get(key)
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value.strip())
+            except ValueError:
+                continue
+    return None
+
+def preference_keywords(preferences: Any) -> List[str]:
+    """Lower-cased keywords from a preferences value.
+
+    A string is one keyword; lists are flattened; for a dict such as
+    ``{"interests": ["museum", "food"], "museums": True}`` the values are
+    used, and a key whose value is ``True`` counts as a keyword itself.
+    """
+    keywords: List[str] = []
+    if isinstance(preferences, str):
+        keywords.append(preferences)
+    elif isinstance(preferences, dict):
+        for key, value in preferences.items():
+            if value is True:
+                keywords.append(str(key).replace("_", " "))
+            else:
+                keywords.extend(preference_keywords(value))
+    elif isinstance(preferences, (list, tuple, set)):
+        for value in preferences:
+            keywords.extend(preference_keywords(value))
+    keywords = [keyword.strip().lower() for keyword in keywords]
+    return list(dict.fromkeys(keyword for keyword in keywords if keyword))
+
+class PlanOptimizer:
+    """Reorders and prunes a multi-day itinerary against trip constraints.
+
+    Supported constraints: ``budget`` (total activity cost), ``max_daily_hours``,
+    ``day_start_hour``, ``opening_hours`` (activity name -> ``[open, close]``,
+    overriding per-activity ``opening_hours``) and ``preferences`` (a keyword,
+    list or preferences dict, see ``preference_keywords``, matched against
+    activity names, categories and types). Numeric constraints may be given
+    as strings; negative ones are treated as zero.
+
+    Each day is simulated in order: travel at ITINERARY_TRAVEL_SPEED_KMH, wait
+    for opening, and the visit must end before closing and within the daily
+    hours. A greedy feasible start is improved by randomized local search
+    (swap, move, drop, re-insert) until ``time_limit``, ``max_iterations``
+    or a run of non-improving moves.
+    """
+
+    def __init__(self, constraints: Dict[str, Any], time_limit: Optional[float] = None,
+                 max_iterations: Optional[int] = None, seed: int = 0):
+        self.budget = _first_number(constraints, ("budget",))
+        if self.budget is not None:
+            self.budget = max(0.0, self.budget)
+        max_daily_hours = _first_number(constraints, ("max_daily_hours",))
+        self.max_daily_hours = max(0.0, max_daily_hours) if max_daily_hours is not None else settings.ITINERARY_DAY_HOURS
+        # 0 (nửa đêm) là giờ bắt đầu hợp lệ, chỉ dùng mặc định khi không có giá trị
+        day_start = _first_number(constraints, ("day_start_hour",))
+        self.day_start = day_start if day_start is not None else settings.ITINERARY_DAY_START_HOUR
+        opening_hours = constraints.get("opening_hours")
+        if opening_hours is not None and not isinstance(opening_hours, dict):
+            logger.warning(f"Ignoring opening_hours constraint, expected a dict: {opening_hours!r}")
+            opening_hours = None
+        self.opening_hours = opening_hours or {}
+        self.preferences = preference_keywords(constraints.get("preferences"))
+        self.time_limit = time_limit if time_limit is not None else settings.PLAN_OPTIMIZATION_TIME_LIMIT
+        self.max_iterations = max_iterations or settings.PLAN_OPTIMIZATION_MAX_ITERATIONS
+        self._random = random.Random(seed)
+
+    def _matches_preferences(self, source: Dict[str, Any]) -> bool:
+        if not self.preferences:
+            return False
+        text = " ".join(str(source.get(key, "")) for key in ("name", "activity", "category", "description"))
+        text = (text + " " + " ".join(map(str, source.get("types") or []))).lower()
+        return any(preference in text for preference in self.preferences)
+
+    def _item(self, index: int, source: Dict[str, Any]) -> PlanItem:
+        duration = _first_number(source, ("duration_hours", "visit_hours")) or settings.ITINERARY_VISIT_HOURS
+        cost = _first_number(source, ("cost", "estimated_cost", "price")) or 0.0
+        window = self.opening_hours.get(source.get("name") or source.get("activity")) or source.get("opening_hours")
+        opens, closes = 0.0, 24.0
+        if isinstance(window, (list, tuple)) and len(window) == 2:
+            opens = parse_hour(window[0]) if parse_hour(window[0]) is not None else opens
+            closes = parse_hour(window[1]) if parse_hour(window[1]) is not None else closes
+        elif isinstance(window, dict):
+            opens = parse_hour(window.get("open")) if parse_hour(window.get("open")) is not None else opens
+            closes = parse_hour(window.get("close")) if parse_hour(window.get("close")) is not None else closes
+        matches = self._matches_preferences(source)
+        rating = _first_number(source, ("priority", "rating"))
+        value = (rating if rating is not None else 1.0) * (1.5 if matches else 1.0)
+        return PlanItem(index, source, duration, cost, opens, closes, value, matches)
+
+    def _simulate(self, day: List[int]) -> Tuple[bool, float, float, float]:
+        """Return ``(feasible, visit_hours, travel_hours, wait_hours)`` for one day's order."""
+        clock = self.day_start
+        visit = travel = wait = 0.0
+        previous = None
+        for index in day:
+            item = self.items[index]
+            if previous is not None:
+                hop = self.travel_hours[previous, index]
+                travel += hop
+                clock += hop
+            if clock < item.opens:
+                wait += item.opens - clock
+                clock = item.opens
+            clock += item.duration
+            visit += item.duration
+            if clock > item.closes + 1e-9:
+                return False, visit, float(travel), wait
+            previous = index
+        return clock - self.day_start <= self.max_daily_hours + 1e-9, visit, float(travel), wait
+
+    def _cost(self, days: List[List[int]]) -> float:
+        return sum(self.items[i].cost for day in days for i in day)
+
+    def _score(self, days: List[List[int]]) -> Optional[float]:
+        """Kept value minus a travel penalty, or None if any constraint is violated."""
+        if self.budget is not None and self._cost(days) > self.budget + 1e-9:
+            return None
+        score = 0.0
+        for day in days:
+            feasible, _, travel, wait = self._simulate(day)
+            if not feasible:
+                return None
+            score += sum(self.items[i].value for i in day) - 0.5 * travel - 0.1 * wait
+        return score
+
+    def _initial_solution(self, days: List[List[int]]) -> Tuple[List[List[int]], List[int]]:
+        """Order each day by closing time and drop stops until every constraint holds."""
+        dropped = []
+        days = [sorted(day, key=lambda i: (self.items[i].closes, self.items[i].opens)) for day in days]
+        for day in days:
+            while day and not self._simulate(day)[0]:
+                worst = min(day, key=lambda i: self.items[i].value)
+                day.remove(worst)
+                dropped.append(worst)
+        while self.budget is not None and self._cost(days) > self.budget:
+            kept = [i for day in days for i in day]
+            if not kept:
+                break
+            worst = min(kept, key=lambda i: self.items[i].value / (self.items[i].cost or 1e-9))
+            for day in days:
+                if worst in day:
+                    day.remove(worst)
+            dropped.append(worst)
+        return days, dropped
+
+    def _neighbour(self, days: List[List[int]], dropped: List[int]):
+        candidate = [list(day) for day in days]
+        candidate_dropped = list(dropped)
+        move = self._random.random()
+        non_empty = [d for d, day in enumerate(candidate) if day]
+        if move < 0.35 and non_empty:
+            # Đổi chỗ hai điểm trong cùng một ngày
+            day = candidate[self._random.choice(non_empty)]
+            if len(day) > 1:
+                a, b = self._random.sample(range(len(day)), 2)
+                day[a], day[b] = day[b], day[a]
+        elif move < 0.65 and non_empty:
+            # Chuyển một điểm sang vị trí/ngày khác
+            source = candidate[self._random.choice(non_empty)]
+            item = source.pop(self._random.randrange(len(source)))
+            target = self._random.choice(candidate)
+            target.insert(self._random.randint(0, len(target)), item)
+        elif move < 0.9 and candidate_dropped:
+            # Thêm lại một điểm đã bỏ
+            item = candidate_dropped.pop(self._random.randrange(len(candidate_dropped)))
+            target = self._random.choice(candidate)
+            target.insert(self._random.randint(0, len(target)), item)
+        elif non_empty:
+            source = candidate[self._random.choice(non_empty)]
+            candidate_dropped.append(source.pop(self._random.randrange(len(source))))
+        return candidate, candidate_dropped
+
+    def optimize(self, itinerary: List[Dict[str, Any]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        self.items: List[PlanItem] = []
+        days: List[List[int]] = []
+        for day in itinerary:
+            indices = []
+            for activity in day.get("activities", []):
+                self.items.append(self._item(len(self.items), activity))
+                indices.append(len(self.items) - 1)
+            days.append(indices)
+
+        coords = extract_coords([item.source for item in self.items])
+        travel_km = haversine_matrix(coords, coords) if len(coords) else np.zeros((0, 0))
+        # Thiếu toạ độ thì coi như không mất thời gian di chuyển
+        self.travel_hours = np.nan_to_num(travel_km, nan=0.0) / settings.ITINERARY_TRAVEL_SPEED_KMH
+
+        best, best_dropped = self._initial_solution(days)
+        best_score = self._score(best)
+        current, current_dropped, current_score = best, best_dropped, best_score
+        iterations = stale = 0
+        # Dừng sớm khi lâu không cải thiện được nữa
+        stale_limit = max(500, 50 * len(self.items))
+        deadline = started + self.time_limit
+        while (self.items and iterations < self.max_iterations and stale < stale_limit
+               and time.perf_counter() < deadline):
+            iterations += 1
+            stale += 1
+            candidate, candidate_dropped = self._neighbour(current, current_dropped)
+            score = self._score(candidate)
+            if score is None or score < current_score - 1e-9:
+                continue
+            current, current_dropped, current_score = candidate, candidate_dropped, score
+            if score > best_score + 1e-9:
+                best, best_dropped, best_score = candidate, candidate_dropped, score
+                stale = 0
+
+        elapsed = time.perf_counter() - started
+        logger.debug(f"Plan optimization: {iterations} iterations in {elapsed * 1000:.1f}ms, score={best_score}")
+        return {
+            "optimized_itinerary": [
+                {**{k: v for k, v in day.items() if k != "activities"},
+                 "activities": [self.items[i].source for i in best[d]]}
+                for d, day in enumerate(itinerary)
+            ],
+            "dropped_activities": [self.items[i].source for i in best_dropped],
+            "optimization_metrics": {
+                **self._metrics(best),
+                "total_cost": round(self._cost(best), 2),
+                "iterations": iterations,
+                "runtime_ms": round(elapsed * 1000, 2)
+            }
+        }
+
+    def _metrics(self, days: List[List[int]]) -> Dict[str, float]:
+        """Efficiency metrics in [0, 1] for a solution.
+
+        - time_efficiency: share of scheduled time spent visiting rather than travelling or waiting
+        - cost_efficiency: value per unit cost, relative to the best value-per-cost activity
+        - preference_match: share of kept activities that match a stated preference
+        """
+        visit = overhead = 0.0
+        for day in days:
+            _, day_visit, travel, wait = self._simulate(day)
+            visit += day_visit
+            overhead += travel + wait
+        kept = [self.items[i] for day in days for i in day]
+        kept_cost = sum(item.cost for item in kept)
+        kept_value = sum(item.value for item in kept)
+        ratios = [item.value / item.cost for item in self.items if item.cost > 0]
+
+        if not kept:
+            cost_efficiency = 0.0
+        elif kept_cost == 0 or not ratios:
+            cost_efficiency = 1.0
+        else:
+            cost_efficiency = min(1.0, (kept_value / kept_cost) / max(ratios))
+
+        if not self.preferences:
+            preference_match = 1.0 if kept else 0.0
+        else:
+            preference_match = sum(item.matches for item in kept) / len(kept) if kept else 0.0
+
+        return {
+            "time_efficiency": round(visit / (visit + overhead), 4) if visit + overhead > 0 else 0.0,
+            "cost_efficiency": round(cost_efficiency, 4),
+            "preference_match": round(preference_match, 4)
+        }
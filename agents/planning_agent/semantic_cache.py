@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Optional: the cache disables itself without it
+    SentenceTransformer = None
+
+class SemanticCache:
+    """Embedding-based completion cache for near-identical prompts.
+
+    Prompts are embedded with a sentence-transformers model and stored in a
+    fixed-capacity NumPy matrix of unit vectors. A lookup returns the cached
+    completion of the most similar stored prompt in the same scope (provider,
+    model and generation parameters) when its cosine similarity reaches
+    ``threshold``. When full, the least recently used row is replaced.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", threshold: float = 0.95,
+                 max_entries: int = 1000):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._model = None
+        self._enabled = SentenceTransformer is not None
+        if not self._enabled:
+            logger.warning("sentence-transformers not installed. Semantic LLM cache disabled.")
+        self._vectors: Optional[np.ndarray] = None
+        self._scopes = np.empty(max_entries, dtype=object)  # Scope key per row
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._values: list = [None] * max_entries
+        self._size = 0
+        self._lock = asyncio.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def _embed_sync(self, text: str) -> np.ndarray:
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        vector = np.asarray(self._model.encode(text, normalize_embeddings=True), dtype=np.float32)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+        return vector
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            # Encoding is CPU-bound, keep it off the event loop
+            return await asyncio.to_thread(self._embed_sync, text)
+        except Exception as e:
+            logger.error(f"Prompt embedding failed, disabling semantic cache: {str(e)}")
+            self._enabled = False
+            return None
+
+    def _best_match(self, vector: np.ndarray, scope: str) -> Tuple[int, float]:
+        if self._size == 0 or self._vectors is None:
+            return -1, 0.0
+        mask = self._scopes[:self._size] == scope
+        if not mask.any():
+            return -1, 0.0
+        similarities = self._vectors[:self._size] @ vector
+        similarities[~mask] = -1.0
+        index = int(np.argmax(similarities))
+        return index, float(similarities[index])
+
+    async def get(self, prompt: str, scope: str) -> Optional[Dict[str, Any]]:
+        """Return the cached completion for a similar prompt in ``scope``, if any."""
+        if not self._enabled:
+            return None
+        self.stats["lookups"] += 1
+        vector = await self._embed(prompt)
+        if vector is None:
+            return None
+        async with self._lock:
+            index, similarity = self._best_match(vector, scope)
+            if index >= 0 and similarity >= self.threshold:
+                self._last_used[index] = time.monotonic()
+                self.stats["hits"] += 1
+                logger.debug(f"Semantic cache hit (similarity={similarity:.3f})")
+                return {**self._values[index], "cache_similarity": round(similarity, 4)}
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, prompt: str, scope: str, value: Dict[str, Any]):
+        if not self._enabled:
+            return
+        vector = await self._embed(prompt)
+        if vector is None:
+            return
+        async with self._lock:
+            index, similarity = self._best_match(vector, scope)
+            if index < 0 or similarity < 0.999:
+                if self._size < self.max_entries:
+                    index = self._size
+                    self._size += 1
+                else:
+                    index = int(np.argmin(self._last_used))
+                    self.stats["evictions"] += 1
+            self._vectors[index] = vector
+            self._scopes[index] = scope
+            self._values[index] = value
+            self._last_used[index] = time.monotonic()
+            self.stats["stores"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["lookups"]
+        return {
+            **self.stats,
+            "enabled": self._enabled,
+            "size": self._size,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+        }
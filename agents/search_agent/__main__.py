@@ -3,7 +3,9 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 from .a2a_server import SearchA2AServer
+from .providers import session_manager, get_persistent_cache
 from common.config import settings
+import asyncio
 import logging
 
 # Configure logging
@@ -16,6 +18,22 @@ app = FastAPI(title="Search Agent", description="Travel search agent with A2A an
 # Initialize A2A server
 a2a_server = SearchA2AServer()
 
+@app.on_event("startup")
+async def startup():
+    """Compact the persistent cache and warm hot keys into memory."""
+    persistent = get_persistent_cache()
+    if persistent is not None:
+        await asyncio.to_thread(persistent.compact)
+        await a2a_server.search_service.warm_caches()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close shared provider sessions and the persistent cache."""
+    await session_manager.close_all()
+    persistent = get_persistent_cache()
+    if persistent is not None:
+        persistent.close()
+
 class SearchRequest(BaseModel):
     """Search request model."""
     type: str
@@ -46,6 +64,11 @@ async def get_capabilities():
     """Get agent capabilities."""
     return a2a_server.get_capabilities()
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Provider cache counters (hits, misses, coalesced fetches)."""
+    return a2a_server.search_service.get_cache_stats()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -3,7 +3,7 @@ from typing import Optional, Dict, Any
 import json
 import logging
 from .adk_integration import SearchAgent
-from .providers import SearchService
+from .agent_logic import SearchService
 from common.config import settings
 
 logger = logging.getLogger(__name__)
@@ -18,7 +18,8 @@ class SearchA2AServer(A2AServer):
         self.capabilities = {
             "search_web": "Search the web for travel-related information",
             "search_places": "Search for specific places, attractions, and accommodations",
-            "combine_results": "Combine and deduplicate results from multiple sources"
+            "combine_results": "Combine and deduplicate results from multiple sources",
+            "search_nearby": "Find cached places near a point by radius or k-nearest"
         }
 
     async def handle_message(self, message: Message) -> Message:
@@ -38,6 +39,8 @@ class SearchA2AServer(A2AServer):
                 response_data = await self._handle_web_search(request)
             elif request["type"] == "place_search":
                 response_data = await self._handle_place_search(request)
+            elif request["type"] == "nearby_search":
+                response_data = await self._handle_nearby_search(request)
             else:
                 response_data = {
                     "error": f"Unsupported request type: {request['type']}"
@@ -112,6 +115,38 @@ class SearchA2AServer(A2AServer):
                 "error": str(e)
             }
 
+    async def _handle_nearby_search(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle nearby lookups against the spatial index of cached places.
+
+        ``query`` is the category (attraction, restaurant, hotel or "all");
+        ``filters`` holds ``lat``, ``lng`` and optionally ``radius_km`` and ``k``.
+        """
+        try:
+            filters = request.get("filters") or {}
+            if "lat" not in filters or "lng" not in filters:
+                raise ValueError("nearby_search requires filters.lat and filters.lng")
+            lat, lng = float(filters["lat"]), float(filters["lng"])
+            radius_km = filters.get("radius_km")
+            category = request["query"] if request["query"] not in ("", "all") else None
+            results = self.search_service.search_nearby(
+                lat, lng, category,
+                radius_km=float(radius_km) if radius_km is not None else None,
+                k=int(filters.get("k", 10))
+            )
+            return {
+                "status": "success",
+                "type": "nearby_search",
+                "query": request["query"],
+                "results": results
+            }
+        except Exception as e:
+            logger.error(f"Nearby search failed: {str(e)}")
+            return {
+                "status": "error",
+                "type": "nearby_search",
+                "error": str(e)
+            }
+
     def _create_error_response(self, error_message: str, original_message: Message) -> Message:
         """Create an error response message."""
         return Message(
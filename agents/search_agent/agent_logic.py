@@ -1,6 +1,8 @@
 import asyncio
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from common.config import settings
+from . import providers
 from .providers import GooglePlacesProvider, TripAdvisorProvider, BookingProvider
 
 logger = logging.getLogger(__name__)
@@ -101,6 +103,39 @@ class SearchService:
             logger.error(f"Error searching hotels: {str(e)}")
             return []
 
+    async def warm_caches(self, limit: int = settings.SEARCH_CACHE_WARM_KEYS) -> int:
+        """Warm each provider's in-memory cache from the persistent tier."""
+        counts = await asyncio.gather(
+            self.google_provider.cache.warm_load(limit),
+            self.tripadvisor_provider.cache.warm_load(limit),
+            self.booking_provider.cache.warm_load(limit)
+        )
+        return sum(counts)
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Return hit/miss/coalesced counters for each provider cache."""
+        stats = {
+            "google_places": self.google_provider.cache.get_stats(),
+            "tripadvisor": self.tripadvisor_provider.cache.get_stats(),
+            "booking": self.booking_provider.cache.get_stats()
+        }
+        if providers.place_index is not None:
+            stats["spatial_index"] = providers.place_index.get_stats()
+        return stats
+
+    def search_nearby(self, lat: float, lng: float, category: Optional[str] = None,
+                      radius_km: Optional[float] = None, k: int = 10) -> List[Dict[str, Any]]:
+        """Cached places near a point, nearest first, without calling any provider.
+
+        With ``radius_km`` returns up to ``k`` places inside that radius,
+        otherwise the ``k`` nearest places.
+        """
+        if providers.place_index is None:
+            raise ValueError("Spatial index is disabled (SPATIAL_INDEX_ENABLED=false)")
+        if radius_km is not None:
+            return providers.place_index.within_radius(lat, lng, radius_km, category, limit=k)
+        return providers.place_index.nearest(lat, lng, k, category)
+
     async def search_all(self, destination: str):
         """Search for attractions, restaurants, and hotels in parallel."""
         attractions, restaurants, hotels = await asyncio.gather(
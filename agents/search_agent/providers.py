@@ -1,36 +1,258 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import aiohttp
 import logging
-from datetime import datetime, timedelta
 from tenacity import retry, stop_after_attempt, wait_exponential
+from common.cache import BoundedCache, PersistentCache
 from common.config import settings
+from .spatial_index import SpatialIndex, category_for_key
 import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
+# Sentinel so cached empty results still count as hits
+_MISSING = object()
+
+_persistent_cache: Optional[PersistentCache] = None
+
+def get_persistent_cache() -> Optional[PersistentCache]:
+    """Return the shared on-disk cache tier, or None when it is disabled."""
+    global _persistent_cache
+    if not settings.SEARCH_CACHE_PERSISTENT:
+        return None
+    if _persistent_cache is None:
+        try:
+            _persistent_cache = PersistentCache(
+                settings.SEARCH_CACHE_DB_PATH,
+                max_entries=settings.SEARCH_CACHE_DB_MAX_ENTRIES,
+                compact_interval=settings.SEARCH_CACHE_COMPACT_INTERVAL
+            )
+        except Exception as e:
+            logger.error(f"Could not open persistent search cache: {str(e)}")
+            return None
+    return _persistent_cache
+
+# Places from every provider cache, for nearby lookups without a provider call
+place_index: Optional[SpatialIndex] = (
+    SpatialIndex(
+        cell_km=settings.SPATIAL_INDEX_CELL_KM,
+        max_places=settings.SPATIAL_INDEX_MAX_PLACES,
+        max_radius_km=settings.SPATIAL_INDEX_MAX_RADIUS_KM,
+        ttl_seconds=settings.SEARCH_CACHE_HARD_EXPIRY * 3600
+    )
+    if settings.SPATIAL_INDEX_ENABLED else None
+)
+
+def index_places(key: str, data: Any, ttl_seconds: Optional[float] = None):
+    """Add cached provider results to the spatial index, if enabled.
+
+    ``ttl_seconds`` is how long the cache entry holding ``data`` lives on,
+    so places leave the index when their entry expires.
+    """
+    category = category_for_key(key)
+    if place_index is not None and category is not None and isinstance(data, list):
+        place_index.add(data, category, ttl_seconds)
+
 class SearchCache:
-    def __init__(self, expire_hours: int = 24):
-        self.cache = {}
-        self.expire_time = timedelta(hours=expire_hours)
+    """In-memory L1 cache over the shared persistent L2 tier.
+
+    Entries are fresh for ``expire_hours``. With ``stale_while_revalidate``
+    they are kept until ``hard_expire_hours`` and served stale while a
+    background task refreshes them.
+    """
+
+    def __init__(self, expire_hours: int = 24, namespace: str = "",
+                 stale_while_revalidate: bool = False, hard_expire_hours: Optional[int] = None):
+        self.namespace = namespace
+        self.ttl_seconds = expire_hours * 3600
+        self.stale_while_revalidate = stale_while_revalidate
+        if stale_while_revalidate:
+            self.hard_ttl_seconds = max(self.ttl_seconds, (hard_expire_hours or expire_hours) * 3600)
+        else:
+            self.hard_ttl_seconds = self.ttl_seconds
+        self.persistent = get_persistent_cache()
+        # Values are {"data": ..., "fresh_until": epoch seconds}, kept until the hard expiry
+        self.cache = BoundedCache(
+            ttl_seconds=self.hard_ttl_seconds,
+            max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+            max_bytes=settings.SEARCH_CACHE_MAX_BYTES,
+            sweep_interval=settings.CACHE_SWEEP_INTERVAL
+        )
+        # Fetches currently running, so concurrent misses share one provider call
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "hits": 0, "misses": 0, "coalesced": 0, "persistent_hits": 0,
+            "stale_serves": 0, "refreshes": 0, "refresh_failures": 0
+        }
+
+    @staticmethod
+    def _is_entry(entry: Any) -> bool:
+        """Rows persisted before entries carried ``fresh_until`` are bare result lists."""
+        return isinstance(entry, dict) and "data" in entry
+
+    @staticmethod
+    def _is_fresh(entry: Dict[str, Any]) -> bool:
+        return entry.get("fresh_until", 0) > time.time()
 
     async def get_or_fetch(self, key: str, fetch_func):
-        now = datetime.now()
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if now - timestamp < self.expire_time:
+        entry = self.cache.get(key, _MISSING)
+        if entry is not _MISSING:
+            if self._is_fresh(entry):
                 logger.debug(f"Cache hit for key: {key}")
-                return data
-        logger.debug(f"Cache miss for key: {key}")
-        data = await fetch_func()
-        self.cache[key] = (data, now)
-        return data
+                self.stats["hits"] += 1
+                return entry["data"]
+            if self.stale_while_revalidate:
+                logger.debug(f"Serving stale entry for key: {key}")
+                self.stats["stale_serves"] += 1
+                self._schedule_refresh(key, fetch_func)
+                return entry["data"]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            logger.debug(f"Joining in-flight fetch for key: {key}")
+            self.stats["coalesced"] += 1
+        else:
+            logger.debug(f"Cache miss for key: {key}")
+            self.stats["misses"] += 1
+            task = self._start_task(key, self._load(key, fetch_func))
+
+        # Shield so one cancelled waiter does not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def _start_task(self, key: str, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        task.add_done_callback(self._consume_exception)
+        self._inflight[key] = task
+        return task
+
+    def _schedule_refresh(self, key: str, fetch_func):
+        """Refresh a stale entry in the background unless a fetch is already running."""
+        if key not in self._inflight:
+            self._start_task(key, self._refresh(key, fetch_func))
+
+    async def _load(self, key: str, fetch_func):
+        try:
+            if self.persistent is not None:
+                stored = await asyncio.to_thread(self.persistent.get, key)
+                # Dòng theo định dạng cũ bị bỏ qua và được lấy lại từ provider
+                if stored is not None and self._is_entry(stored[0]):
+                    entry, remaining_ttl = stored
+                    self.cache.set(key, entry, ttl_seconds=remaining_ttl)
+                    index_places(key, entry["data"], remaining_ttl)
+                    if self._is_fresh(entry):
+                        logger.debug(f"Persistent cache hit for key: {key}")
+                        self.stats["persistent_hits"] += 1
+                        return entry["data"]
+                    if self.stale_while_revalidate:
+                        logger.debug(f"Serving stale persistent entry for key: {key}")
+                        self.stats["stale_serves"] += 1
+                        # Runs after this task has left _inflight
+                        asyncio.get_running_loop().call_soon(self._schedule_refresh, key, fetch_func)
+                        return entry["data"]
+
+            data = await fetch_func()
+            # Failures propagate to every waiter and are never cached
+            await self._store(key, data)
+            return data
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _refresh(self, key: str, fetch_func):
+        try:
+            data = await fetch_func()
+            # Providers return [] on errors; keep the stale data rather than replace it
+            if not data:
+                logger.warning(f"Background refresh for {key} returned no results, keeping stale entry")
+                self.stats["refresh_failures"] += 1
+                return
+            await self._store(key, data)
+            self.stats["refreshes"] += 1
+        except Exception as e:
+            logger.warning(f"Background refresh for {key} failed: {str(e)}")
+            self.stats["refresh_failures"] += 1
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _store(self, key: str, data: Any):
+        # Providers return [] on errors (outage, 429), so never cache those in either tier
+        if not data:
+            return
+        entry = {"data": data, "fresh_until": time.time() + self.ttl_seconds}
+        self.cache.set(key, entry)
+        index_places(key, data, self.hard_ttl_seconds)
+        if self.persistent is not None:
+            await asyncio.to_thread(self.persistent.set, key, entry, self.hard_ttl_seconds)
+
+    async def warm_load(self, limit: int) -> int:
+        """Load the hottest persisted entries for this namespace into memory."""
+        if self.persistent is None or limit <= 0:
+            return 0
+        entries = await asyncio.to_thread(self.persistent.hot_entries, self.namespace, limit)
+        entries = [(key, entry, remaining_ttl) for key, entry, remaining_ttl in entries
+                   if self._is_entry(entry)]
+        for key, entry, remaining_ttl in entries:
+            self.cache.set(key, entry, ttl_seconds=remaining_ttl)
+            index_places(key, entry["data"], remaining_ttl)
+        logger.info(f"Warm-loaded {len(entries)} cached entries for {self.namespace or 'search'}")
+        return len(entries)
+
+    @staticmethod
+    def _consume_exception(task: asyncio.Task):
+        """Avoid 'exception was never retrieved' warnings when all waiters went away."""
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        served = self.stats["hits"] + self.stats["stale_serves"]
+        lookups = served + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.cache.get_stats(),
+            **self.stats,
+            "inflight": len(self._inflight),
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0
+        }
+
+class ProviderSessionManager:
+    """Keeps one long-lived aiohttp session per provider."""
+
+    def __init__(self):
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    async def get_session(self, provider: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(provider)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=settings.SEARCH_CONNECTION_LIMIT_PER_HOST,
+                ttl_dns_cache=settings.SEARCH_DNS_CACHE_TTL,
+                use_dns_cache=True
+            )
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[provider] = session
+            logger.debug(f"Created shared session for provider: {provider}")
+        return session
+
+    async def close_all(self):
+        """Close every provider session. Call on application shutdown."""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+
+# Shared by all provider instances in this process
+session_manager = ProviderSessionManager()
 
 class GooglePlacesProvider:
     def __init__(self):
         self.api_key = settings.GOOGLE_PLACES_API_KEY
         if not self.api_key:
             logger.warning("GOOGLE_PLACES_API_KEY not set. Google Places searches will fail.")
-        self.cache = SearchCache(expire_hours=settings.SEARCH_CACHE_DURATION)
+        self.cache = SearchCache(
+            expire_hours=settings.SEARCH_CACHE_DURATION,
+            namespace="google_places:",
+            stale_while_revalidate=settings.SEARCH_CACHE_STALE_WHILE_REVALIDATE,
+            hard_expire_hours=settings.SEARCH_CACHE_HARD_EXPIRY
+        )
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     async def _make_request(self, session: aiohttp.ClientSession, url: str, params: Dict) -> Dict:
@@ -86,16 +308,16 @@ class GooglePlacesProvider:
         cache_key = f"google_places:{search_query}:{type}"
         
         async def fetch():
-            async with aiohttp.ClientSession() as session:
-                url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-                params = {
-                    "query": search_query,
-                    "key": self.api_key,
-                    "type": type
-                }
-                data = await self._make_request(session, url, params)
-                results = data.get("results", [])[:settings.MAX_RESULTS_PER_CATEGORY]
-                return [self._process_place(place) for place in results]
+            session = await session_manager.get_session("google_places")
+            url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+            params = {
+                "query": search_query,
+                "key": self.api_key,
+                "type": type
+            }
+            data = await self._make_request(session, url, params)
+            results = data.get("results", [])[:settings.MAX_RESULTS_PER_CATEGORY]
+            return [self._process_place(place) for place in results]
         
         return await self.cache.get_or_fetch(cache_key, fetch)
 
@@ -116,7 +338,12 @@ class TripAdvisorProvider:
         self.api_key = settings.TRIPADVISOR_API_KEY
         if not self.api_key:
             logger.warning("TRIPADVISOR_API_KEY not set. TripAdvisor searches will fail.")
-        self.cache = SearchCache(expire_hours=settings.SEARCH_CACHE_DURATION)
+        self.cache = SearchCache(
+            expire_hours=settings.SEARCH_CACHE_DURATION,
+            namespace="tripadvisor:",
+            stale_while_revalidate=settings.SEARCH_CACHE_STALE_WHILE_REVALIDATE,
+            hard_expire_hours=settings.SEARCH_CACHE_HARD_EXPIRY
+        )
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     async def search_places(self, location: str = None, query: str = None, destination: str = None, type: str = None) -> List[Dict[str, Any]]:
@@ -145,33 +372,33 @@ class TripAdvisorProvider:
         cache_key = f"tripadvisor:{search_location}:{type}"
         
         async def fetch():
-            async with aiohttp.ClientSession() as session:
-                url = "https://api.content.tripadvisor.com/api/v1/location/search"
-                params = {
-                    "key": self.api_key,
-                    "searchQuery": search_location,
-                    "category": type,
-                    "language": "vi"
-                }
-                try:
-                    async with session.get(url, params=params, timeout=settings.SEARCH_TIMEOUT) as response:
-                        if response.status == 403:
-                            logger.error("TripAdvisor API access forbidden. Check API key validity.")
-                            return []
-                        elif response.status == 429:
-                            logger.error("TripAdvisor API rate limit exceeded.")
-                            return []
-                        elif response.status >= 400:
-                            logger.error(f"TripAdvisor API error: {response.status}")
-                            return []
-                        data = await response.json()
-                        return data.get("data", [])[:settings.MAX_RESULTS_PER_CATEGORY]
-                except asyncio.TimeoutError:
-                    logger.error(f"TripAdvisor request timed out after {settings.SEARCH_TIMEOUT}s")
-                    return []
-                except Exception as e:
-                    logger.error(f"TripAdvisor request failed: {str(e)}")
-                    return []
+            session = await session_manager.get_session("tripadvisor")
+            url = "https://api.content.tripadvisor.com/api/v1/location/search"
+            params = {
+                "key": self.api_key,
+                "searchQuery": search_location,
+                "category": type,
+                "language": "vi"
+            }
+            try:
+                async with session.get(url, params=params, timeout=settings.SEARCH_TIMEOUT) as response:
+                    if response.status == 403:
+                        logger.error("TripAdvisor API access forbidden. Check API key validity.")
+                        return []
+                    elif response.status == 429:
+                        logger.error("TripAdvisor API rate limit exceeded.")
+                        return []
+                    elif response.status >= 400:
+                        logger.error(f"TripAdvisor API error: {response.status}")
+                        return []
+                    data = await response.json()
+                    return data.get("data", [])[:settings.MAX_RESULTS_PER_CATEGORY]
+            except asyncio.TimeoutError:
+                logger.error(f"TripAdvisor request timed out after {settings.SEARCH_TIMEOUT}s")
+                return []
+            except Exception as e:
+                logger.error(f"TripAdvisor request failed: {str(e)}")
+                return []
 
         return await self.cache.get_or_fetch(cache_key, fetch)
 
@@ -180,7 +407,7 @@ class BookingProvider:
         self.api_key = settings.BOOKING_API_KEY
         if not self.api_key:
             logger.warning("BOOKING_API_KEY not set. Booking.com searches will fail.")
-        self.cache = SearchCache(expire_hours=settings.SEARCH_CACHE_DURATION)
+        self.cache = SearchCache(expire_hours=settings.SEARCH_CACHE_DURATION, namespace="booking:")
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     async def search_hotels(self, location: str = None, query: str = None, destination: str = None) -> List[Dict[str, Any]]:
@@ -208,30 +435,30 @@ class BookingProvider:
         cache_key = f"booking:{search_location}"
         
         async def fetch():
-            async with aiohttp.ClientSession() as session:
-                url = "https://distribution-xml.booking.com/json/bookings"
-                params = {
-                    "city": search_location,
-                    "apikey": self.api_key
-                }
-                try:
-                    async with session.get(url, params=params, timeout=settings.SEARCH_TIMEOUT) as response:
-                        if response.status == 403:
-                            logger.error("Booking.com API access forbidden. Check API key validity.")
-                            return []
-                        elif response.status == 429:
-                            logger.error("Booking.com API rate limit exceeded.")
-                            return []
-                        elif response.status >= 400:
-                            logger.error(f"Booking.com API error: {response.status}")
-                            return []
-                        data = await response.json()
-                        return data.get("hotels", [])[:settings.MAX_RESULTS_PER_CATEGORY]
-                except asyncio.TimeoutError:
-                    logger.error(f"Booking.com request timed out after {settings.SEARCH_TIMEOUT}s")
-                    return []
-                except Exception as e:
-                    logger.error(f"Booking.com request failed: {str(e)}")
-                    return []
+            session = await session_manager.get_session("booking")
+            url = "https://distribution-xml.booking.com/json/bookings"
+            params = {
+                "city": search_location,
+                "apikey": self.api_key
+            }
+            try:
+                async with session.get(url, params=params, timeout=settings.SEARCH_TIMEOUT) as response:
+                    if response.status == 403:
+                        logger.error("Booking.com API access forbidden. Check API key validity.")
+                        return []
+                    elif response.status == 429:
+                        logger.error("Booking.com API rate limit exceeded.")
+                        return []
+                    elif response.status >= 400:
+                        logger.error(f"Booking.com API error: {response.status}")
+                        return []
+                    data = await response.json()
+                    return data.get("hotels", [])[:settings.MAX_RESULTS_PER_CATEGORY]
+            except asyncio.TimeoutError:
+                logger.error(f"Booking.com request timed out after {settings.SEARCH_TIMEOUT}s")
+                return []
+            except Exception as e:
+                logger.error(f"Booking.com request failed: {str(e)}")
+                return []
 
         return await self.cache.get_or_fetch(cache_key, fetch) 
\ No newline at end of file
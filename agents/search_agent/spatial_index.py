@@ -0,0 +1,253 @@
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from common.geo import EARTH_RADIUS_KM, haversine_matrix, place_coords
+
+logger = logging.getLogger(__name__)
+
+KM_PER_DEGREE = 2 * math.pi * EARTH_RADIUS_KM / 360
+
+# Provider place types (last segment of a cache key) to index categories
+CATEGORY_BY_TYPE = {
+    "tourist_attraction": "attraction",
+    "attractions": "attraction",
+    "restaurant": "restaurant",
+    "restaurants": "restaurant",
+    "lodging": "hotel",
+    "hotels": "hotel"
+}
+
+def category_for_key(key: str) -> Optional[str]:
+    """Index category of a provider cache key, e.g. ``google_places:...:restaurant``."""
+    if key.startswith("booking:"):
+        return "hotel"
+    return CATEGORY_BY_TYPE.get(key.rsplit(":", 1)[-1])
+
+class SpatialIndex:
+    """In-memory grid index of places for radius and k-nearest lookups.
+
+    Points are bucketed into cells of about ``cell_km`` on a lat/lng grid
+    whose longitude columns wrap around at ±180°. Coordinates live in a
+    growable NumPy array, so a query only gathers the cells around the
+    target and computes haversine distances for those candidates in one
+    vectorized step. Places are deduplicated by
+    ``place_id`` (or name) per category and updated in place when re-added.
+
+    Every place expires ``ttl_seconds`` after it was last added, matching the
+    cache entry it came from, and expired places are never returned. When
+    ``max_places`` is reached, expired places are purged first and then the
+    least recently seen ones are evicted to make room. Query radii are capped
+    at ``max_radius_km``.
+    """
+
+    def __init__(self, cell_km: float = 1.0, max_places: int = 100000,
+                 max_radius_km: float = 50.0, ttl_seconds: Optional[float] = None):
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        # Longitude columns wrap at ±180°, so they split 360° evenly
+        self._lng_cells = max(1, math.ceil(360 / self.cell_deg))
+        self._lng_deg = 360 / self._lng_cells
+        self.max_places = max_places
+        self.max_radius_km = max_radius_km
+        self.ttl_seconds = ttl_seconds
+        self._coords = np.empty((1024, 2))
+        self._seen = np.zeros(1024)
+        self._expires = np.zeros(1024)
+        # Slot -> (category, place_id) and place dict; None marks a free slot
+        self._keys: List[Optional[Tuple[str, str]]] = []
+        self._places: List[Optional[Dict[str, Any]]] = []
+        self._free: List[int] = []
+        self._ids: Dict[Tuple[str, str], int] = {}
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / self.cell_deg)),
+                int(math.floor((lng + 180) / self._lng_deg)) % self._lng_cells)
+
+    @staticmethod
+    def _place_id(place: Dict[str, Any]) -> Optional[str]:
+        place_id = place.get("place_id") or place.get("location_id") or place.get("hotel_id")
+        if place_id:
+            return str(place_id)
+        name = place.get("name")
+        return name.strip().lower() if isinstance(name, str) and name.strip() else None
+
+    def add(self, places: List[Dict[str, Any]], category: str,
+            ttl_seconds: Optional[float] = None) -> int:
+        """Index places that have coordinates; returns how many were new.
+
+        ``ttl_seconds`` overrides the index default for these places, e.g.
+        the remaining lifetime of the cache entry they were loaded from.
+        """
+        now = time.monotonic()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires = now + ttl if ttl is not None else math.inf
+        added = 0
+        for place in places or []:
+            if not isinstance(place, dict):
+                continue
+            point = place_coords(place)
+            place_id = self._place_id(place)
+            if point is None or place_id is None:
+                continue
+            key = (category, place_id)
+            index = self._ids.get(key)
+            if index is None:
+                if len(self._ids) >= self.max_places:
+                    self._make_room(now)
+                index = self._allocate()
+                self._keys[index] = key
+                self._ids[key] = index
+                self._coords[index] = point
+                self._cells.setdefault(self._cell(*point), []).append(index)
+                added += 1
+            else:
+                self._move(index, point)
+            self._places[index] = place
+            self._seen[index] = now
+            self._expires[index] = expires
+        return added
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        index = len(self._places)
+        if index == len(self._coords):
+            self._coords = np.concatenate([self._coords, np.empty_like(self._coords)])
+            self._seen = np.concatenate([self._seen, np.zeros_like(self._seen)])
+            self._expires = np.concatenate([self._expires, np.zeros_like(self._expires)])
+        self._keys.append(None)
+        self._places.append(None)
+        return index
+
+    def _remove(self, index: int):
+        cell = self._cell(*self._coords[index])
+        members = self._cells[cell]
+        members.remove(index)
+        if not members:
+            del self._cells[cell]
+        del self._ids[self._keys[index]]
+        self._keys[index] = None
+        self._places[index] = None
+        self._free.append(index)
+
+    def _live_slots(self) -> np.ndarray:
+        return np.fromiter(self._ids.values(), dtype=int, count=len(self._ids))
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Drop places past their expiry; returns how many were removed."""
+        now = time.monotonic() if now is None else now
+        slots = self._live_slots()
+        expired = slots[self._expires[slots] <= now]
+        for index in expired:
+            self._remove(int(index))
+        return len(expired)
+
+    def _make_room(self, now: float):
+        if self.purge_expired(now):
+            return
+        # Bỏ một lượt khoảng 1/10 số điểm ít được thấy gần đây nhất để không phải dọn ở mỗi lần thêm
+        slots = self._live_slots()
+        count = min(len(slots), max(1, self.max_places // 10))
+        oldest = slots[np.argpartition(self._seen[slots], count - 1)[:count]]
+        for index in oldest:
+            self._remove(int(index))
+        self.evictions += count
+        logger.debug(f"Spatial index full, evicted {count} least recently seen places")
+
+    def _move(self, index: int, point: Tuple[float, float]):
+        old_cell = self._cell(*self._coords[index])
+        new_cell = self._cell(*point)
+        if old_cell != new_cell:
+            self._cells[old_cell].remove(index)
+            if not self._cells[old_cell]:
+                del self._cells[old_cell]
+            self._cells.setdefault(new_cell, []).append(index)
+        self._coords[index] = point
+
+    def _candidates(self, lat: float, lng: float, radius_km: float,
+                    category: Optional[str]) -> np.ndarray:
+        row, col = self._cell(lat, lng)
+        lat_steps = int(math.ceil(radius_km / KM_PER_DEGREE / self.cell_deg))
+        # Kinh độ co lại theo vĩ độ nên cần quét nhiều ô hơn theo chiều ngang
+        lng_scale = max(math.cos(math.radians(min(abs(lat) + radius_km / KM_PER_DEGREE, 89.0))), 1e-6)
+        lng_steps = int(math.ceil(radius_km / (KM_PER_DEGREE * lng_scale) / self._lng_deg))
+        # Cửa sổ vượt qua kinh tuyến 180° thì quay vòng về các cột ở phía bên kia
+        lng_steps = min(lng_steps, self._lng_cells // 2)
+        cols = {(col + step) % self._lng_cells for step in range(-lng_steps, lng_steps + 1)}
+        indices = []
+        if (2 * lat_steps + 1) * len(cols) > len(self._cells):
+            # Cửa sổ lớn hơn số ô đang có điểm: duyệt các ô có điểm thay vì mọi ô trong cửa sổ
+            for (r, c), members in self._cells.items():
+                if abs(r - row) <= lat_steps and c in cols:
+                    indices.extend(members)
+        else:
+            for r in range(row - lat_steps, row + lat_steps + 1):
+                for c in cols:
+                    indices.extend(self._cells.get((r, c), ()))
+        if category is not None:
+            indices = [i for i in indices if self._keys[i][0] == category]
+        indices = np.array(indices, dtype=int)
+        return indices[self._expires[indices] > time.monotonic()]
+
+    def _distances(self, lat: float, lng: float, indices: np.ndarray) -> np.ndarray:
+        return haversine_matrix(np.array([[lat, lng]]), self._coords[indices])[0]
+
+    def _results(self, indices: np.ndarray, distances: np.ndarray) -> List[Dict[str, Any]]:
+        order = np.argsort(distances, kind="stable")
+        return [
+            {**self._places[indices[i]], "category": self._keys[indices[i]][0],
+             "distance_km": round(float(distances[i]), 3)}
+            for i in order
+        ]
+
+    def within_radius(self, lat: float, lng: float, radius_km: float,
+                      category: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Places within ``radius_km`` (at most ``max_radius_km``) of a point, nearest first."""
+        radius_km = min(max(radius_km, 0.0), self.max_radius_km)
+        indices = self._candidates(lat, lng, radius_km, category)
+        if not len(indices):
+            return []
+        distances = self._distances(lat, lng, indices)
+        inside = distances <= radius_km
+        results = self._results(indices[inside], distances[inside])
+        return results[:limit] if limit else results
+
+    def nearest(self, lat: float, lng: float, k: int = 10, category: Optional[str] = None,
+                max_radius_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        """The ``k`` nearest places within ``max_radius_km``, nearest first.
+
+        The search radius doubles from one cell until ``k`` places are found
+        inside it, so the answer is exact within ``max_radius_km``.
+        """
+        if max_radius_km is None:
+            max_radius_km = self.max_radius_km
+        max_radius_km = min(max_radius_km, self.max_radius_km)
+        radius = self.cell_deg * KM_PER_DEGREE
+        while True:
+            radius = min(radius, max_radius_km)
+            indices = self._candidates(lat, lng, radius, category)
+            if len(indices):
+                distances = self._distances(lat, lng, indices)
+                inside = distances <= radius
+                if inside.sum() >= k or radius >= max_radius_km:
+                    return self._results(indices[inside], distances[inside])[:k]
+            elif radius >= max_radius_km:
+                return []
+            radius *= 2
+
+    def get_stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for category, _ in self._ids:
+            counts[category] = counts.get(category, 0) + 1
+        return {
+            "places": len(self._ids),
+            "cells": len(self._cells),
+            "by_category": counts,
+            "evictions": self.evictions
+        }
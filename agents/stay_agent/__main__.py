@@ -7,7 +7,7 @@ class StayAgent:
         return await execute(payload)
 
 agent = StayAgent()
-app = create_app(agent)
+app = create_app(agent, agent_name="stay")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8004)
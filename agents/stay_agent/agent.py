@@ -1,23 +1,117 @@
-import asyncio
+from typing import Any, Dict, List, Optional
+import numpy as np
+from common.config import settings
+from common.geo import extract_coords, haversine_matrix
+
+DEFAULT_STAY = {
+    "name": "Khách sạn mặc định",
+    "price_per_night": 500000,
+    "note": "Đề xuất mặc định."
+}
+
+def _as_float(value: Any) -> Optional[float]:
+    """A number, or a numeric string such as ``"500000"``, as float; None otherwise."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if np.isfinite(number) else None
+
+def _numeric(hotels: List[Dict[str, Any]], key: str) -> np.ndarray:
+    """Column of a numeric hotel field, NaN where missing or invalid."""
+    values = np.full(len(hotels), np.nan)
+    for i, hotel in enumerate(hotels):
+        value = _as_float(hotel.get(key))
+        if value is not None:
+            values[i] = value
+    return values
+
+def score_hotels(hotels: List[Dict[str, Any]], attractions: List[Dict[str, Any]],
+                 nightly_budget: Optional[float] = None,
+                 weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """Weighted score in [0, 1] for every hotel, computed column-wise.
+
+    Criteria are price per night against the group's nightly budget, rating,
+    review count (log-scaled) and mean distance to the attractions. A hotel
+    missing a field gets a neutral 0.5 for that criterion. Negative weights
+    count as zero, and if no weight is left every criterion counts equally.
+    """
+    weights = weights or settings.STAY_RANKING_WEIGHTS
+    n = len(hotels)
+
+    # Giá: trong ngân sách được 0.5-1 (càng rẻ càng cao), vượt 50% ngân sách thì về 0
+    price = _numeric(hotels, "price_per_night")
+    if nightly_budget and nightly_budget > 0:
+        ratio = price / nightly_budget
+        price_score = np.where(ratio <= 1, 1 - 0.5 * ratio, np.maximum(0.0, 0.5 - (ratio - 1)))
+    elif np.isfinite(price).any() and np.nanmax(price) > 0:
+        price_score = 1 - price / np.nanmax(price)
+    else:
+        price_score = np.full(n, np.nan)
+
+    rating_score = np.clip(_numeric(hotels, "rating") / 5.0, 0.0, 1.0)
+
+    reviews = np.log1p(np.maximum(_numeric(hotels, "reviews"), 0))
+    max_reviews = np.nanmax(reviews) if np.isfinite(reviews).any() else 0.0
+    reviews_score = reviews / max_reviews if max_reviews > 0 else np.full(n, np.nan)
+
+    distance_score = np.full(n, np.nan)
+    attraction_coords = extract_coords(attractions)
+    attraction_coords = attraction_coords[~np.isnan(attraction_coords).any(axis=1)]
+    if len(attraction_coords):
+        distances = haversine_matrix(extract_coords(hotels), attraction_coords).mean(axis=1)
+        distance_score = np.exp(-distances / settings.STAY_DISTANCE_SCALE_KM)
+
+    criteria = np.stack([price_score, rating_score, reviews_score, distance_score])
+    criteria = np.where(np.isnan(criteria), 0.5, criteria)
+    weight_vector = np.array([_as_float(weights.get(name)) or 0.0
+                              for name in ("price", "rating", "reviews", "distance")])
+    weight_vector = np.maximum(weight_vector, 0.0)
+    if weight_vector.sum() <= 0:
+        weight_vector = np.ones(len(criteria))
+    return weight_vector @ criteria / weight_vector.sum()
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` best scores, best first, via a partial sort."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=int)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+def _stay_option(hotel: Dict[str, Any], score: float) -> Dict[str, Any]:
+    return {
+        "name": hotel.get("name", DEFAULT_STAY["name"]),
+        "price_per_night": hotel.get("price_per_night", 0),
+        "rating": hotel.get("rating"),
+        "address": hotel.get("address", ""),
+        "score": round(float(score), 4)
+    }
 
 def generate_stay_plan(payload: dict) -> dict:
     hotels = payload.get("hotels", [])
-    if hotels:
-        # Chọn khách sạn có giá thấp nhất
-        selected = sorted(hotels, key=lambda x: x.get("price_per_night", float('inf')))[0]
-        stay = {
-            "name": selected.get("name", "Khách sạn mặc định"),
-            "price_per_night": selected.get("price_per_night", 0),
-            "note": "Đề xuất dựa trên giá cả phù hợp và vị trí thuận tiện."
-        }
-    else:
-        stay = {
-            "name": "Khách sạn mặc định",
-            "price_per_night": 500000,
-            "note": "Đề xuất mặc định."
-        }
-    return {"stays": stay}
+    if not hotels:
+        return {"stays": dict(DEFAULT_STAY), "stay_options": []}
+
+    # Ngân sách mỗi đêm cho cả nhóm; dữ liệu batch JSONL có thể gửi số dưới dạng chuỗi
+    budget_per_person = _as_float(payload.get("budget_per_person"))
+    num_people = _as_float(payload.get("num_people"))
+    if not num_people or num_people <= 0:
+        num_people = 1
+    nightly_budget = budget_per_person * num_people if budget_per_person and budget_per_person > 0 else None
+
+    top_k = _as_float(payload.get("top_k"))
+    top_k = max(1, int(top_k)) if top_k is not None else settings.STAY_TOP_K
+
+    scores = score_hotels(hotels, payload.get("attractions", []), nightly_budget)
+    options = [_stay_option(hotels[i], scores[i]) for i in top_k_indices(scores, top_k)]
+    stay = {
+        **options[0],
+        "note": "Đề xuất dựa trên giá so với ngân sách, đánh giá và khoảng cách tới các điểm tham quan."
+    }
+    return {"stays": stay, "stay_options": options}
 
 async def execute(payload: dict) -> dict:
-    await asyncio.sleep(1)
     return generate_stay_plan(payload)
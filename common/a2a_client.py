@@ -1,21 +1,166 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
 import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
+from .base_agent import A2AError
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class A2AClientPool:
+    """Process-wide pool of keep-alive HTTP clients, one per agent base URL."""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._lock = asyncio.Lock()
+        self._http2 = self._http2_available(settings.A2A_CONFIG.get("HTTP2", False))
+
+    @staticmethod
+    def _http2_available(requested: bool) -> bool:
+        """HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 without it."""
+        if not requested:
+            return False
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning("HTTP2 enabled for A2A calls but 'h2' is not installed. Using HTTP/1.1.")
+            return False
+
+    def _create_client(self, base_url: str) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.A2A_CONFIG.get("MAX_CONNECTIONS_PER_AGENT", 20),
+            max_keepalive_connections=settings.A2A_CONFIG.get("MAX_KEEPALIVE_CONNECTIONS", 10),
+            keepalive_expiry=settings.A2A_CONFIG.get("KEEPALIVE_EXPIRY", 30)
+        )
+        return httpx.AsyncClient(
+            base_url=base_url,
+            timeout=settings.A2A_CONFIG.get("TIMEOUT", 60),
+            limits=limits,
+            http2=self._http2
+        )
+
+    async def get_client(self, base_url: str) -> httpx.AsyncClient:
+        """Return the shared client for an agent, creating it on first use."""
+        client = self._clients.get(base_url)
+        if client is not None and not client.is_closed:
+            return client
+        async with self._lock:
+            client = self._clients.get(base_url)
+            if client is None or client.is_closed:
+                client = self._create_client(base_url)
+                self._clients[base_url] = client
+                logger.debug(f"Created pooled A2A client for {base_url}")
+            return client
+
+    async def startup(self, base_urls: Optional[list[str]] = None):
+        """Pre-create clients for known agents so the first request skips setup."""
+        for base_url in base_urls or []:
+            await self.get_client(base_url)
+
+    async def shutdown(self):
+        """Close all pooled clients and their connections."""
+        async with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+# Shared pool for all A2A calls in this process
+client_pool = A2AClientPool()
 
 class A2AClient:
     def __init__(self, base_url: str):
         self.base_url = base_url
         self._circuit_breaker = CircuitBreaker()
-    
+
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     async def call_agent(self, endpoint: str, payload: dict) -> dict:
         if not self._circuit_breaker.is_available():
             raise ServiceUnavailableError()
-            
+
         try:
-            async with httpx.AsyncClient(timeout=60) as client:
-                response = await client.post(f"{self.base_url}/{endpoint}", json=payload)
-                response.raise_for_status()
-                return response.json()
+            client = await client_pool.get_client(self.base_url)
+            response = await client.post(f"/{endpoint}", json=payload)
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
             self._circuit_breaker.record_failure()
             raise
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+async def call_agent(base_url: str, payload: dict, endpoint: str = "run") -> dict:
+    """Call an agent endpoint through the shared client pool."""
+    client = await client_pool.get_client(base_url)
+    response = await client.post(f"/{endpoint}", json=payload)
+    response.raise_for_status()
+    return response.json()
+
+def error_from_result(result) -> Optional[A2AError]:
+    """The error an ``{"error": ...}`` agent result reports, or None for a normal result."""
+    if not isinstance(result, dict) or "error" not in result:
+        return None
+    error = result["error"]
+    if isinstance(error, dict):
+        return A2AError(str(error.get("code", "UNKNOWN")), str(error.get("message", "")))
+    return A2AError("UNKNOWN", str(error))
+
+class AgentBatcher:
+    """Coalesces concurrent calls to one agent into ``/run_batch`` requests.
+
+    The first call opens a batch and waits ``linger_ms`` for more; a batch is
+    sent early once it reaches ``max_batch_size``. Each caller gets its own
+    item result; an item that came back as an error dict is raised to its
+    caller like an unbatched HTTP error, and a failed batch request fails
+    every call in it.
+    """
+
+    def __init__(self, base_url: str, linger_ms: float = 10.0, max_batch_size: int = 32):
+        self.base_url = base_url
+        self.linger = linger_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def call(self, payload: dict) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((payload, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.linger, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.create_task(self._send(batch))
+
+    async def _send(self, batch: List[Tuple[dict, asyncio.Future]]):
+        try:
+            if len(batch) == 1:
+                results = [await call_agent(self.base_url, batch[0][0])]
+            else:
+                response = await call_agent(
+                    self.base_url, {"payloads": [payload for payload, _ in batch]}, endpoint="run_batch"
+                )
+                results = response["results"]
+                if len(results) != len(batch):
+                    raise ValueError(f"Batch of {len(batch)} returned {len(results)} results")
+            logger.debug(f"Sent batch of {len(batch)} calls to {self.base_url}")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            error = error_from_result(result)
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -1,14 +1,175 @@
-from fastapi import FastAPI, Request
+import asyncio
+import json
+import logging
+import random
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from .a2a_client import client_pool
+from .base_agent import A2AError, ErrorHandler, TaskManager
+from .config import settings, get_project_root
+from .telemetry import collect_model_calls, with_model_calls
 
-def create_app(agent):
+logger = logging.getLogger(__name__)
+
+class LatencyInjector:
+    """Adds simulated latency before each agent run, for load tests and staging.
+
+    ``spec`` is one entry of ``settings.LATENCY_INJECTION``: a fixed delay, a
+    uniform, normal or lognormal distribution, or delays sampled from a JSON
+    list of recorded latencies in seconds.
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.mode = spec.get("mode", "fixed")
+        self.spec = spec
+        self._samples: list[float] = []
+        if self.mode == "recorded":
+            path = Path(spec["path"])
+            if not path.is_absolute():
+                path = get_project_root() / path
+            self._samples = [float(value) for value in json.loads(path.read_text())]
+            if not self._samples:
+                raise ValueError(f"No recorded latencies in {path}")
+        elif self.mode not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency injection mode: {self.mode}")
+
+    def sample(self) -> float:
+        spec = self.spec
+        if self.mode == "fixed":
+            delay = spec.get("seconds", 0.0)
+        elif self.mode == "uniform":
+            delay = random.uniform(spec.get("min", 0.0), spec["max"])
+        elif self.mode == "normal":
+            delay = random.gauss(spec["mean"], spec.get("stddev", 0.0))
+        elif self.mode == "lognormal":
+            delay = spec["median"] * random.lognormvariate(0.0, spec.get("sigma", 0.5))
+        else:
+            delay = random.choice(self._samples)
+        return max(0.0, delay)
+
+    def wrap(self, execute: Callable[[dict], Awaitable[dict]]) -> Callable[[dict], Awaitable[dict]]:
+        async def delayed_execute(payload: dict) -> dict:
+            await asyncio.sleep(self.sample())
+            return await execute(payload)
+        return delayed_execute
+
+def latency_injector_for(agent_name: Optional[str]) -> Optional[LatencyInjector]:
+    """Injector configured for ``agent_name``, or None when injection is off."""
+    if not settings.LATENCY_INJECTION_ENABLED or agent_name is None:
+        return None
+    spec = settings.LATENCY_INJECTION.get(agent_name)
+    if not spec:
+        return None
+    logger.warning(f"Latency injection enabled for {agent_name} agent: {spec}")
+    return LatencyInjector(spec)
+
+async def run_batch(execute: Callable[[dict], Awaitable[dict]], payloads: list[dict],
+                    max_concurrency: int = settings.BATCH_MAX_CONCURRENCY) -> list[dict]:
+    """Run ``execute`` over payloads with bounded parallelism.
+
+    Results keep the order of ``payloads``; a failing item becomes an error
+    dict in its slot instead of failing the whole batch.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(payload: dict) -> dict:
+        async with semaphore:
+            try:
+                return await execute(payload)
+            except Exception as e:
+                return await ErrorHandler.handle_error(e)
+
+    return list(await asyncio.gather(*(run_one(payload) for payload in payloads)))
+
+def create_app(agent, peer_urls: Optional[list[str]] = None, agent_name: Optional[str] = None):
     app = FastAPI()
+    task_manager = getattr(agent, "task_manager", None) or TaskManager()
+    injector = latency_injector_for(agent_name)
+    agent_execute = injector.wrap(agent.execute) if injector is not None else agent.execute
+
+    async def execute(payload: dict) -> dict:
+        # Trả kèm các lần gọi model để bên gọi (orchestrator) ghi vào telemetry của nó
+        with collect_model_calls() as calls:
+            result = await agent_execute(payload)
+        return with_model_calls(result, calls)
+
+    @app.on_event("startup")
+    async def startup():
+        await client_pool.startup(peer_urls)
+        await task_manager.start()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await task_manager.shutdown()
+        if hasattr(agent, "shutdown"):
+            await agent.shutdown()
+        await client_pool.shutdown()
 
     @app.post("/run")
     async def run(request: Request):
         payload = await request.json()
-        result = await agent.execute(payload)
+        result = await execute(payload)
         return result
 
+    @app.post("/run_batch")
+    async def run_batch_endpoint(request: Request):
+        """Run many payloads concurrently; body is ``{"payloads": [...]}``."""
+        body = await request.json()
+        payloads = body.get("payloads") if isinstance(body, dict) else None
+        if not isinstance(payloads, list):
+            raise HTTPException(status_code=400, detail="Body must be an object with a 'payloads' list")
+        if len(payloads) > settings.BATCH_MAX_SIZE:
+            raise HTTPException(status_code=413,
+                                detail=f"Batch exceeds {settings.BATCH_MAX_SIZE} payloads")
+        return {"results": await run_batch(execute, payloads)}
+
+    @app.post("/run/stream")
+    async def run_stream(request: Request):
+        """Stream partial results as newline-delimited JSON events."""
+        if not hasattr(agent, "execute_stream"):
+            raise HTTPException(status_code=404, detail="Agent does not support streaming")
+        payload = await request.json()
+
+        async def ndjson():
+            async for event in agent.execute_stream(payload):
+                yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    @app.post("/tasks", status_code=202)
+    async def submit_task(request: Request):
+        """Queue a run in the background and return its task id immediately."""
+        payload = await request.json()
+        try:
+            task_id = await task_manager.submit(payload, execute)
+        except A2AError as e:
+            status_code = 409 if e.code == "DUPLICATE_TASK" else 503
+            return JSONResponse(status_code=status_code,
+                                content={"error": {"code": e.code, "message": e.message}})
+        return {"task_id": task_id, "status": "pending"}
+
+    @app.get("/tasks/{task_id}")
+    async def get_task(task_id: str):
+        task = task_manager.get_task(task_id)
+        if task is None:
+            raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+        return {
+            "task_id": task_id,
+            "status": task["status"],
+            "result": task["result"],
+            "created_at": task["created_at"],
+            "finished_at": task["finished_at"]
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        """Agent health and cache counters, for agents that report them."""
+        if not hasattr(agent, "get_stats"):
+            raise HTTPException(status_code=404, detail="Agent does not report stats")
+        return agent.get_stats()
+
     @app.get("/.well-known/agent-card")
     async def get_agent_card():
         return agent.get_card()
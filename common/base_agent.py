@@ -2,11 +2,14 @@ from python_a2a import A2AServer, Message, TextContent, MessageRole
 from google.adk import Agent as ADKAgent, Tool
 from google.adk.tools import google_search
 from typing import Dict, Any, List, Optional
+import asyncio
 import json
 import logging
+import time
+import uuid
 from .config import settings
+from .cache import BoundedCache
 from functools import lru_cache
-from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -18,8 +21,8 @@ class BaseAgent(ADKAgent):
         # Add ADK-specific configurations
         self.adk_config = {
             "model": settings.DEFAULT_MODEL,
-            "temperature": settings.TEMPERATURE,
-            "max_tokens": settings.MAX_TOKENS,
+            "temperature": settings.DEFAULT_TEMPERATURE,
+            "max_tokens": settings.DEFAULT_MAX_TOKENS,
             "use_tools": True,
             "stream": False
         }
@@ -57,8 +60,8 @@ class BaseA2AAgent(A2AServer):
             description=self.description,
             tools=[],  # Should be overridden by subclasses
             model=settings.DEFAULT_MODEL,
-            temperature=settings.TEMPERATURE,
-            max_tokens=settings.MAX_TOKENS
+            temperature=settings.DEFAULT_TEMPERATURE,
+            max_tokens=settings.DEFAULT_MAX_TOKENS
         )
 
     async def handle_message(self, message: Message) -> Message:
@@ -167,21 +170,121 @@ class ErrorHandler:
         return {"error": {"code": "UNKNOWN", "message": str(error)}}
 
 class TaskManager:
-    def __init__(self):
+    """Tracks task status and runs submitted tasks on a bounded worker pool.
+
+    Finished tasks are dropped ``result_ttl`` seconds after completion.
+    """
+
+    FINISHED_STATUSES = ("completed", "failed")
+
+    def __init__(self, max_workers: int = settings.TASK_WORKERS,
+                 max_queue: int = settings.TASK_QUEUE_SIZE,
+                 result_ttl: int = settings.TASK_RESULT_TTL):
         self.tasks = {}
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
         
     async def create_task(self, task_id: str, payload: dict):
+        # Tasks submitted through the worker pool already have an entry
+        if task_id is None or task_id in self.tasks:
+            return
         self.tasks[task_id] = {
             "status": "pending",
             "payload": payload,
-            "result": None
+            "result": None,
+            "created_at": time.time(),
+            "finished_at": None
         }
         
     async def update_task_status(self, task_id: str, status: str, result: dict = None):
         if task_id in self.tasks:
             self.tasks[task_id]["status"] = status
             if result:
-                self.tasks[task_id]["result"] = result 
+                self.tasks[task_id]["result"] = result
+            if status in self.FINISHED_STATUSES:
+                self.tasks[task_id]["finished_at"] = time.time()
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        self.cleanup_expired()
+        return self.tasks.get(task_id)
+
+    async def start(self):
+        """Start the worker pool. Safe to call more than once."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+        self._workers.append(asyncio.create_task(self._sweeper()))
+
+    async def shutdown(self):
+        """Stop the worker pool and fail every task that had not finished.
+
+        A later ``submit`` starts a fresh pool instead of queueing work that
+        no worker would run.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        error = await ErrorHandler.handle_error(
+            A2AError("SHUTDOWN", "Task manager shut down before the task finished")
+        )
+        for task_id, task in self.tasks.items():
+            if task["status"] not in self.FINISHED_STATUSES:
+                await self.update_task_status(task_id, "failed", error)
+
+    async def submit(self, payload: dict, handler) -> str:
+        """Queue ``handler(payload)`` and return its task id immediately."""
+        if self._queue is None:
+            await self.start()
+        task_id = payload.get("task_id") or uuid.uuid4().hex
+        if task_id in self.tasks:
+            raise A2AError("DUPLICATE_TASK", f"Task {task_id} already exists")
+        payload = {**payload, "task_id": task_id}
+        await self.create_task(task_id, payload)
+        try:
+            self._queue.put_nowait((task_id, payload, handler))
+        except asyncio.QueueFull:
+            del self.tasks[task_id]
+            raise A2AError("QUEUE_FULL", "Too many pending tasks, retry later")
+        return task_id
+
+    async def _worker(self):
+        while True:
+            task_id, payload, handler = await self._queue.get()
+            try:
+                await self.update_task_status(task_id, "running")
+                result = await handler(payload)
+                # Agents report failures as an {"error": ...} payload
+                if isinstance(result, dict) and "error" in result:
+                    await self.update_task_status(task_id, "failed", result)
+                else:
+                    await self.update_task_status(task_id, "completed", result)
+            except Exception as e:
+                logger.error(f"Task {task_id} failed: {str(e)}")
+                await self.update_task_status(task_id, "failed", await ErrorHandler.handle_error(e))
+            finally:
+                self._queue.task_done()
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(max(1, min(self.result_ttl, 60)))
+            self.cleanup_expired()
+
+    def cleanup_expired(self) -> int:
+        """Remove finished tasks older than the result TTL."""
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            task_id for task_id, task in self.tasks.items()
+            if task.get("finished_at") and task["finished_at"] < cutoff
+        ]
+        for task_id in expired:
+            del self.tasks[task_id]
+        return len(expired)
 
 class ToolRegistry:
     def __init__(self):
@@ -196,19 +299,20 @@ class ToolRegistry:
         return await self._tools[tool_name].execute(**kwargs) 
 
 class ResultCache:
-    def __init__(self, ttl: int = 3600):
-        self._cache = {}
+    def __init__(self, ttl: int = 3600, max_entries: int = 1000, max_bytes: Optional[int] = None):
+        self._cache = BoundedCache(
+            ttl_seconds=ttl,
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            sweep_interval=settings.CACHE_SWEEP_INTERVAL
+        )
         self._ttl = ttl
         
     async def get(self, key: str) -> Optional[Dict[str, Any]]:
-        if key in self._cache:
-            entry = self._cache[key]
-            if datetime.now() - entry["timestamp"] < timedelta(seconds=self._ttl):
-                return entry["data"]
-        return None
+        return self._cache.get(key)
         
     async def set(self, key: str, value: Dict[str, Any]):
-        self._cache[key] = {
-            "data": value,
-            "timestamp": datetime.now()
-        } 
\ No newline at end of file
+        self._cache.set(key, value)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self._cache.get_stats()
@@ -0,0 +1,219 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from .config import get_project_root
+
+logger = logging.getLogger(__name__)
+
+class BoundedCache:
+    """In-memory LRU cache with TTL expiry and entry/byte limits.
+
+    Expired entries are dropped lazily on read and by a sweep that runs at
+    most once per ``sweep_interval`` seconds on writes. Sizes are estimated
+    from the JSON encoding of each value, so ``max_bytes`` is approximate.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1000,
+                 max_bytes: Optional[int] = None, sweep_interval: float = 300.0):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # key -> (value, expires_at, size); ordered from least to most recently used
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        try:
+            return len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return len(repr(value))
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return default
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return default
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        if key in self._entries:
+            self._remove(key)
+        size = self._estimate_size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            logger.debug(f"Value for key {key} ({size} bytes) exceeds cache max_bytes, not cached")
+            return
+        expires_at = time.monotonic() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        self._entries[key] = (value, expires_at, size)
+        self._bytes += size
+        self._maybe_sweep()
+        self._evict()
+
+    def delete(self, key: str) -> bool:
+        if key in self._entries:
+            self._remove(key)
+            return True
+        return False
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _evict(self):
+        """Drop least recently used entries until both bounds hold."""
+        while self._entries and (
+            len(self._entries) > self.max_entries or
+            (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.stats["evictions"] += 1
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep_expired(now)
+
+    def sweep_expired(self, now: Optional[float] = None) -> int:
+        """Remove all expired entries and return how many were dropped."""
+        now = now if now is not None else time.monotonic()
+        self._last_sweep = now
+        expired = [key for key, (_, expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.stats["expirations"] += len(expired)
+        return len(expired)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+        }
+
+class PersistentCache:
+    """SQLite-backed key/value store used as an L2 tier behind ``BoundedCache``.
+
+    Values are stored as JSON with an absolute expiry time. Methods are
+    blocking; async callers should run them with ``asyncio.to_thread``.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 50000, compact_interval: float = 3600.0):
+        path = Path(db_path)
+        if not path.is_absolute():
+            path = get_project_root() / path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = path
+        self.max_entries = max_entries
+        self.compact_interval = compact_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_expires ON entries (expires_at)")
+        self._conn.commit()
+        self._last_compact = time.time()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return ``(value, remaining_ttl_seconds)`` or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE entries SET hits = hits + 1, last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return json.loads(value), expires_at - now
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        now = time.time()
+        encoded = json.dumps(value, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO entries (key, value, expires_at, last_access, hits) VALUES (?, ?, ?, ?, 0) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                "expires_at = excluded.expires_at, last_access = excluded.last_access",
+                (key, encoded, now + ttl_seconds, now)
+            )
+            self._conn.commit()
+        if now - self._last_compact >= self.compact_interval:
+            self.compact()
+
+    def hot_entries(self, prefix: str = "", limit: int = 100) -> list[Tuple[str, Any, float]]:
+        """Return the most used unexpired entries as ``(key, value, remaining_ttl)``."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value, expires_at FROM entries "
+                "WHERE substr(key, 1, ?) = ? AND expires_at > ? "
+                "ORDER BY hits DESC, last_access DESC LIMIT ?",
+                (len(prefix), prefix, now, limit)
+            ).fetchall()
+        return [(key, json.loads(value), expires_at - now) for key, value, expires_at in rows]
+
+    def compact(self) -> int:
+        """Drop expired rows, trim to ``max_entries`` by least recent access, reclaim space."""
+        now = time.time()
+        with self._lock:
+            self._last_compact = now
+            removed = self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+            removed += self._conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            self._conn.commit()
+            if removed:
+                self._conn.execute("VACUUM")
+        logger.debug(f"Compacted persistent cache {self.db_path}: removed {removed} entries")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
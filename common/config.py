@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 from pathlib import Path
@@ -29,27 +29,49 @@ class Settings(BaseSettings):
     MEAL_AGENT_URL: str = "http://localhost:8003"
     STAY_AGENT_URL: str = "http://localhost:8004"
     
+    # Agent Transports: "http", "inprocess" (call the agent function directly)
+    # or "process" (run it in a local process pool). Search is always HTTP.
+    AGENT_TRANSPORTS: Dict[str, str] = {
+        "search": "http",
+        "entertainment": "http",
+        "meal": "http",
+        "stay": "http"
+    }
+    AGENT_PROCESS_POOL_WORKERS: int = 2
+    
     # Model Configurations
     MODEL_CONFIGS: Dict[str, Dict[str, Any]] = {
         "gpt-4o": {
+            "provider": "openai",
+            "max_concurrency": 8,  # In-flight requests per provider
+            "requests_per_minute": 500,
             "complexity": "HIGH",
             "context_length": 8000,
             "cost_per_token": 0.03,
             "strengths": ["complex_reasoning", "creative_tasks", "detailed_planning"]
         },
         "gpt-4o-mini": {
+            "provider": "openai",
+            "max_concurrency": 16,
+            "requests_per_minute": 1000,
             "complexity": "MEDIUM",
             "context_length": 4000,
             "cost_per_token": 0.015,
             "strengths": ["complex_reasoning", "basic_planning"]
         },
         "gemini-2.0-flash": {
+            "provider": "gemini",
+            "max_concurrency": 8,
+            "requests_per_minute": 300,
             "complexity": "MEDIUM",
             "context_length": 4000,
             "cost_per_token": 0.01,
             "strengths": ["factual_queries", "basic_planning", "information_extraction"]
         },
         "claude-3.7-sonnet": {
+            "provider": "claude",
+            "max_concurrency": 4,
+            "requests_per_minute": 50,
             "complexity": "HIGH",
             "context_length": 6000,
             "cost_per_token": 0.02,
@@ -61,11 +83,102 @@ class Settings(BaseSettings):
     DEFAULT_TEMPERATURE: float = 0.7
     DEFAULT_MAX_TOKENS: int = 2000
     DEFAULT_MODEL: str = "gpt-4o"  # Default model to use
+    LLM_REQUEST_TIMEOUT: int = 60  # seconds
+    LLM_RATE_LIMIT_BACKOFF: int = 10  # seconds to pause a provider after a 429 without Retry-After
+    
+    # Model Routing Telemetry
+    MODEL_LATENCY_SLO: float = 10.0  # seconds, p95 target per model
+    MODEL_TELEMETRY_WINDOW: int = 200  # recent calls kept per model
+    MODEL_TELEMETRY_MAX_AGE: float = 300.0  # seconds before a sample stops counting
+    MODEL_TELEMETRY_MIN_SAMPLES: int = 10  # Below this, score on static config only
+    MODEL_DEGRADED_ERROR_RATE: float = 0.25  # Above this, route away from the model
+    MODEL_SELECTION_CACHE_TTL: float = 30.0  # seconds a memoized selection is reused
+    
+    # LLM Provider Fallback
+    LLM_PROVIDER_PRIORITY: List[str] = ["openai", "gemini", "claude"]
+    LLM_FALLBACK_ENABLED: bool = True
+    LLM_PROVIDER_TIMEOUT: float = 30.0  # seconds before failing over to the next provider
+    LLM_HEDGE_ENABLED: bool = False  # Also start the next provider when one is slow
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Below this, use LLM_HEDGE_DEFAULT_DELAY
+    LLM_HEDGE_DEFAULT_DELAY: float = 5.0  # seconds
+    
+    # LLM Response Caching
+    LLM_SEMANTIC_CACHE_ENABLED: bool = True  # Needs sentence-transformers
+    LLM_SEMANTIC_CACHE_MODEL: str = "all-MiniLM-L6-v2"
+    LLM_SEMANTIC_CACHE_THRESHOLD: float = 0.95  # Minimum cosine similarity for a hit
+    LLM_SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+    LLM_EXACT_CACHE_ENABLED: bool = True  # Serves temperature 0 or cache_exact=True requests
+    LLM_EXACT_CACHE_BACKEND: str = "memory"  # "memory" or "disk"
+    LLM_EXACT_CACHE_DB_PATH: str = "cache/llm_cache.db"  # Relative to project root
+    LLM_EXACT_CACHE_TTL: int = 7 * 24 * 3600  # seconds
+    LLM_EXACT_CACHE_MAX_ENTRIES: int = 5000
+    
+    # Itinerary Planning
+    ITINERARY_DAY_START_HOUR: float = 8.0
+    ITINERARY_DAY_HOURS: float = 9.0  # Sightseeing time budget per day, travel included
+    ITINERARY_VISIT_HOURS: float = 1.5  # Default time spent at an attraction
+    ITINERARY_TRAVEL_SPEED_KMH: float = 25.0  # Average city travel speed between stops
+    PLAN_OPTIMIZATION_TIME_LIMIT: float = 0.2  # seconds of local search per plan
+    PLAN_OPTIMIZATION_MAX_ITERATIONS: int = 20000
+    
+    # Stay Ranking
+    STAY_TOP_K: int = 3  # Hotels returned per stay plan
+    STAY_RANKING_WEIGHTS: Dict[str, float] = {
+        "price": 0.35,
+        "rating": 0.3,
+        "reviews": 0.15,
+        "distance": 0.2
+    }
+    STAY_DISTANCE_SCALE_KM: float = 3.0  # Distance score decays as exp(-km / scale)
     
     # Search Configurations
     SEARCH_CACHE_DURATION: int = 24  # hours
     MAX_RESULTS_PER_CATEGORY: int = 10
     SEARCH_TIMEOUT: int = 30  # seconds
+    SEARCH_CONNECTION_LIMIT_PER_HOST: int = 10  # Pooled connections per provider host
+    SEARCH_DNS_CACHE_TTL: int = 300  # seconds
+    SEARCH_CACHE_MAX_ENTRIES: int = 1000  # Per provider cache
+    SEARCH_CACHE_MAX_BYTES: int = 50 * 1024 * 1024  # Approximate, per provider cache
+    CACHE_SWEEP_INTERVAL: int = 300  # seconds between expired-entry sweeps
+    SEARCH_CACHE_PERSISTENT: bool = True  # SQLite tier under ./cache, survives restarts
+    SEARCH_CACHE_DB_PATH: str = "cache/search_cache.db"  # Relative to project root
+    SEARCH_CACHE_DB_MAX_ENTRIES: int = 50000
+    SEARCH_CACHE_COMPACT_INTERVAL: int = 3600  # seconds
+    SEARCH_CACHE_WARM_KEYS: int = 200  # Hot keys loaded per provider at startup
+    SEARCH_CACHE_STALE_WHILE_REVALIDATE: bool = True  # Place providers only; hotel prices always refetch
+    SEARCH_CACHE_HARD_EXPIRY: int = 72  # hours; stale place data is never served past this
+    SPATIAL_INDEX_ENABLED: bool = True  # Index cached places for nearby_search
+    SPATIAL_INDEX_CELL_KM: float = 1.0
+    SPATIAL_INDEX_MAX_PLACES: int = 100000  # Least recently seen places are evicted past this
+    SPATIAL_INDEX_MAX_RADIUS_KM: float = 50.0  # Upper bound on nearby_search radius
+    
+    # Orchestrator Result Cache
+    TRIP_RESULT_CACHE_TTL: int = 3600  # seconds
+    TRIP_RESULT_CACHE_MAX_ENTRIES: int = 500
+    
+    # Async Task API
+    TASK_WORKERS: int = 4  # Concurrent background tasks per agent
+    TASK_QUEUE_SIZE: int = 100
+    TASK_RESULT_TTL: int = 3600  # seconds to keep finished task results
+    
+    # Latency Injection (load tests and staging only, keep disabled in production)
+    LATENCY_INJECTION_ENABLED: bool = False
+    # Per agent name, one of:
+    #   {"mode": "fixed", "seconds": 1.0}
+    #   {"mode": "uniform", "min": 0.2, "max": 1.5}
+    #   {"mode": "normal", "mean": 0.8, "stddev": 0.2}
+    #   {"mode": "lognormal", "median": 0.8, "sigma": 0.5}
+    #   {"mode": "recorded", "path": "latency/meal.json"}  # JSON list of seconds
+    LATENCY_INJECTION: Dict[str, Dict[str, Any]] = {}
+    
+    # Request Batching
+    BATCH_MAX_SIZE: int = 100  # Payloads accepted per /run_batch call
+    BATCH_MAX_CONCURRENCY: int = 8  # Payloads executed at once per batch
+    A2A_BATCHING_ENABLED: bool = False  # Coalesce concurrent orchestrator calls per agent
+    A2A_BATCH_AGENTS: List[str] = ["entertainment", "meal", "stay"]
+    A2A_BATCH_LINGER_MS: float = 10.0  # Wait for more calls before sending a batch
+    A2A_BATCH_MAX_SIZE: int = 32
     
     # Application Settings
     DEBUG: bool = False
@@ -83,7 +196,11 @@ class Settings(BaseSettings):
     A2A_CONFIG: Dict[str, Any] = {
         "MAX_RETRIES": 3,
         "TIMEOUT": 60,
-        "CIRCUIT_BREAKER_THRESHOLD": 5
+        "CIRCUIT_BREAKER_THRESHOLD": 5,
+        "MAX_CONNECTIONS_PER_AGENT": 20,  # Pooled connections per agent base URL
+        "MAX_KEEPALIVE_CONNECTIONS": 10,
+        "KEEPALIVE_EXPIRY": 30,  # seconds
+        "HTTP2": False  # Requires the optional h2 package
     }
     
     # Agent-specific settings
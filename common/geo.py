@@ -0,0 +1,52 @@
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+def _coordinate(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+def place_coords(item: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """(lat, lng) of a place dict, or None when it has no usable coordinates.
+
+    Accepts the search agent's ``{"location": {"lat": .., "lng": ..}}`` shape
+    as well as top-level ``lat``/``lng`` or ``latitude``/``longitude`` keys.
+    """
+    location = item.get("location") if isinstance(item.get("location"), dict) else item
+    lat = _coordinate(location.get("lat", location.get("latitude")))
+    lng = _coordinate(location.get("lng", location.get("longitude")))
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+def extract_coords(items: List[Dict[str, Any]]) -> np.ndarray:
+    """Return an (n, 2) array of (lat, lng) in degrees, NaN where unknown."""
+    coords = np.full((len(items), 2), np.nan)
+    for i, item in enumerate(items):
+        point = place_coords(item)
+        if point is not None:
+            coords[i] = point
+    return coords
+
+def haversine_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Great-circle distances in km between every row of ``a`` and of ``b``.
+
+    Both inputs are (n, 2) arrays of (lat, lng) degrees; the result is (len(a), len(b)).
+    NaN coordinates give NaN distances.
+    """
+    a_rad = np.radians(a)
+    b_rad = np.radians(b)
+    dlat = b_rad[None, :, 0] - a_rad[:, None, 0]
+    dlng = b_rad[None, :, 1] - a_rad[:, None, 1]
+    h = (np.sin(dlat / 2) ** 2 +
+         np.cos(a_rad[:, None, 0]) * np.cos(b_rad[None, :, 0]) * np.sin(dlng / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
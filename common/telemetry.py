@@ -0,0 +1,145 @@
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from .config import settings
+
+class LatencyTracker:
+    """Rolling per-key latency samples and success/failure counts.
+
+    Keeps the last ``window`` calls per key (a provider or model name), so
+    percentiles and error rates follow recent behaviour. With ``max_age``
+    set, samples older than that many seconds are dropped as well, so a key
+    that stops receiving traffic falls back below any sample threshold
+    instead of keeping its last verdict forever.
+    """
+
+    def __init__(self, window: int = 200, max_age: Optional[float] = None):
+        self.window = window
+        self.max_age = max_age
+        # key -> deque of (timestamp, latency_seconds, success)
+        self._samples: Dict[str, Deque[Tuple[float, float, bool]]] = {}
+
+    def record(self, key: str, latency: float, success: bool = True):
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+        samples.append((time.monotonic(), latency, success))
+
+    def _recent(self, key: str) -> Deque[Tuple[float, float, bool]]:
+        samples = self._samples.get(key)
+        if not samples:
+            return deque()
+        if self.max_age is not None:
+            # Mẫu được thêm theo thứ tự thời gian nên chỉ cần bỏ từ đầu deque
+            cutoff = time.monotonic() - self.max_age
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+        return samples
+
+    def count(self, key: str) -> int:
+        return len(self._recent(key))
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """Latency percentile (0-100) over successful calls, or None without samples."""
+        latencies = sorted(latency for _, latency, ok in self._recent(key) if ok)
+        if not latencies:
+            return None
+        rank = max(0, math.ceil(q / 100 * len(latencies)) - 1)
+        return latencies[rank]
+
+    def error_rate(self, key: str) -> float:
+        samples = self._recent(key)
+        if not samples:
+            return 0.0
+        return sum(1 for _, _, ok in samples if not ok) / len(samples)
+
+    def snapshot(self, key: str) -> Dict[str, Optional[float]]:
+        return {
+            "samples": self.count(key),
+            "p50": self.percentile(key, 50),
+            "p95": self.percentile(key, 95),
+            "error_rate": round(self.error_rate(key), 4)
+        }
+
+class ModelTelemetry(LatencyTracker):
+    """LatencyTracker that also keeps recent token usage per model."""
+
+    def __init__(self, window: int = 200, max_age: Optional[float] = None):
+        super().__init__(window, max_age)
+        self._tokens: Dict[str, Deque[int]] = {}
+
+    def record(self, key: str, latency: float, success: bool = True, tokens: Optional[int] = None):
+        super().record(key, latency, success)
+        if tokens:
+            usage = self._tokens.get(key)
+            if usage is None:
+                usage = self._tokens[key] = deque(maxlen=self.window)
+            usage.append(tokens)
+
+    def avg_tokens(self, key: str) -> Optional[float]:
+        usage = self._tokens.get(key)
+        if not usage:
+            return None
+        return sum(usage) / len(usage)
+
+    def snapshot(self, key: str) -> Dict[str, Optional[float]]:
+        return {**super().snapshot(key), "avg_tokens": self.avg_tokens(key)}
+
+def total_tokens(usage: Optional[Dict[str, Any]]) -> Optional[int]:
+    """Total tokens from an OpenAI- or Claude-style usage dict."""
+    if not usage:
+        return None
+    if usage.get("total_tokens"):
+        return usage["total_tokens"]
+    tokens = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    return tokens or None
+
+# Shared per-model telemetry, fed by AI clients and by the model calls agents report back
+model_telemetry = ModelTelemetry(
+    window=settings.MODEL_TELEMETRY_WINDOW,
+    max_age=settings.MODEL_TELEMETRY_MAX_AGE
+)
+
+# Model calls made while serving the current agent request, see collect_model_calls
+_model_calls: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("model_calls", default=None)
+
+def record_model_call(model: str, latency: float, success: bool = True, tokens: Optional[int] = None):
+    """Record one LLM call.
+
+    Inside ``collect_model_calls`` the call is handed to the collector, so the
+    caller of the agent (usually the orchestrator, in another process) records
+    it; otherwise it goes to this process's ``model_telemetry``.
+    """
+    calls = _model_calls.get()
+    if calls is None:
+        model_telemetry.record(model, latency, success, tokens)
+    else:
+        calls.append({"model": model, "latency": latency, "success": success, "tokens": tokens})
+
+@contextmanager
+def collect_model_calls() -> Iterator[List[Dict[str, Any]]]:
+    """Collect the model calls made within the block, including worker threads and tasks it starts."""
+    calls: List[Dict[str, Any]] = []
+    token = _model_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _model_calls.reset(token)
+
+def with_model_calls(result: Any, calls: List[Dict[str, Any]]) -> Any:
+    """``result`` with the collected calls attached as ``model_calls``, if there were any."""
+    if calls and isinstance(result, dict):
+        return {**result, "model_calls": calls}
+    return result
+
+def run_collecting_model_calls(func: Callable[[dict], dict], payload: dict) -> dict:
+    """Run a synchronous agent function and attach the model calls it made.
+
+    Module level so it can be sent to a process pool.
+    """
+    with collect_model_calls() as calls:
+        result = func(payload)
+    return with_model_calls(result, calls)
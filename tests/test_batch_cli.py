@@ -0,0 +1,57 @@
+"""Smoke test for the bulk trip-plan CLI, run end to end through ``main()``.
+
+Entertainment, meal and stay run in-process; the search agent's HTTP call is
+replaced with fixed places, so no agent servers or API keys are needed.
+"""
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("google.adk")
+pytest.importorskip("python_a2a")
+
+from agents.orchestrator_agent import batch, transport
+from common.config import settings
+
+SEARCH_RESULT = {
+    "attractions": [
+        {"name": "Dragon Bridge", "lat": 16.0612, "lng": 108.2272, "price": 0, "rating": 4.6},
+        {"name": "Marble Mountains", "lat": 16.0036, "lng": 108.2640, "price": 40000, "rating": 4.5}
+    ],
+    "restaurants": [
+        {"name": "Bep Hen", "lat": 16.0600, "lng": 108.2200, "price": 150000, "rating": 4.4}
+    ],
+    "hotels": [
+        {"name": "Riverside Hotel", "lat": 16.0650, "lng": 108.2250, "price": 600000, "rating": 4.2}
+    ]
+}
+
+async def fake_call_agent(base_url, payload):
+    return SEARCH_RESULT
+
+def test_main_plans_every_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AGENT_TRANSPORTS", {
+        "search": "http", "entertainment": "inprocess", "meal": "inprocess", "stay": "inprocess"
+    })
+    monkeypatch.setattr(settings, "A2A_BATCHING_ENABLED", False)
+    monkeypatch.setattr(transport, "call_agent", fake_call_agent)
+
+    input_path = tmp_path / "trips.jsonl"
+    output_path = tmp_path / "plans.jsonl"
+    input_path.write_text(
+        json.dumps({"destination": "Da Nang", "start_date": "2025-06-01", "end_date": "2025-06-02",
+                    "num_people": 2, "budget_per_person": 3000000}) + "\n"
+        + "not json\n",
+        encoding="utf-8"
+    )
+
+    summary = asyncio.run(batch.main([str(input_path), "-o", str(output_path), "--report-every", "0"]))
+
+    assert summary["processed"] == 2
+    assert summary["succeeded"] == 1
+    records = {record["line"]: record
+               for record in map(json.loads, output_path.read_text(encoding="utf-8").splitlines())}
+    assert records[1]["ok"] is True
+    assert records[1]["result"]["itinerary"]
+    assert records[2]["ok"] is False
@@ -2,6 +2,34 @@
 import streamlit as st
 import requests
 import datetime
+import json
+
+def render_itinerary(container, itinerary):
+    with container.container():
+        if itinerary:
+            for day in itinerary:
+                st.write(f"**Day {day.get('day', '')}:**")
+                for activity in day.get("activities", []):
+                    st.write(f"- *{activity.get('time', '')}*: {activity.get('activity', '')}")
+        else:
+            st.write("No detailed itinerary available.")
+
+def render_meals(container, meals):
+    with container.container():
+        if meals:
+            for meal in meals:
+                st.write(f"**Day {meal.get('day', '')}:** Lunch - {meal.get('lunch', '')} | Dinner - {meal.get('dinner', '')}")
+        else:
+            st.write("No detailed meal plan available.")
+
+def render_stays(container, stays):
+    with container.container():
+        if stays:
+            st.write(f"- **Name**: {stays.get('name', '')}")
+            st.write(f"- **Price/night**: {stays.get('price_per_night', '')} VND")
+            st.write(f"- **Notes**: {stays.get('note', '')}")
+        else:
+            st.write("No accommodation suggestions available.")
 
 st.title("Trip Planner Application")
 
@@ -12,6 +40,7 @@ with st.form(key='trip_form'):
     end_date = st.date_input("Return date", datetime.date.today() + datetime.timedelta(days=3))
     num_people = st.number_input("Number of people", min_value=1, value=2)
     budget_per_person = st.number_input("Budget per person (VND)", min_value=100000, value=500000, step=100000)
+    bypass_cache = st.checkbox("Generate a fresh plan (ignore cached results)", value=False)
     submit_button = st.form_submit_button(label='Plan Trip')
 
 if submit_button:
@@ -20,41 +49,41 @@ if submit_button:
         "start_date": start_date.strftime("%Y-%m-%d"),
         "end_date": end_date.strftime("%Y-%m-%d"),
         "num_people": num_people,
-        "budget_per_person": budget_per_person
+        "budget_per_person": budget_per_person,
+        "bypass_cache": bypass_cache
     }
-    st.info("Creating your travel plan, please wait...")
+    status = st.info("Creating your travel plan, please wait...")
+    st.subheader("Itinerary:")
+    itinerary_section = st.empty()
+    st.subheader("Meal Plan:")
+    meals_section = st.empty()
+    st.subheader("Accommodation Suggestions:")
+    stays_section = st.empty()
     try:
-        # Call Orchestrator Agent (port 8000)
-        response = requests.post("http://localhost:8000/run", json=payload, timeout=60)
-        response.raise_for_status()
-        result = response.json()
-        st.success("Your travel plan is ready!")
-        
-        st.subheader("Itinerary:")
-        itinerary = result.get("itinerary", [])
-        if itinerary:
-            for day in itinerary:
-                st.write(f"**Day {day.get('day', '')}:**")
-                for activity in day.get("activities", []):
-                    st.write(f"- *{activity.get('time', '')}*: {activity.get('activity', '')}")
-        else:
-            st.write("No detailed itinerary available.")
-        
-        st.subheader("Meal Plan:")
-        meals = result.get("meals", [])
-        if meals:
-            for meal in meals:
-                st.write(f"**Day {meal.get('day', '')}:** Lunch - {meal.get('lunch', '')} | Dinner - {meal.get('dinner', '')}")
-        else:
-            st.write("No detailed meal plan available.")
-        
-        st.subheader("Accommodation Suggestions:")
-        stays = result.get("stays", {})
-        if stays:
-            st.write(f"- **Name**: {stays.get('name', '')}")
-            st.write(f"- **Price/night**: {stays.get('price_per_night', '')} VND")
-            st.write(f"- **Notes**: {stays.get('note', '')}")
-        else:
-            st.write("No accommodation suggestions available.")
+        # Stream stage results from the Orchestrator Agent (port 8000) as they complete
+        with requests.post("http://localhost:8000/run/stream", json=payload, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                data = event.get("data", {})
+                if event.get("event") == "stage":
+                    if event.get("stage") == "search":
+                        status.info("Found places, building your itinerary...")
+                    elif event.get("stage") == "entertainment":
+                        render_itinerary(itinerary_section, data.get("itinerary", []))
+                    elif event.get("stage") == "meal":
+                        render_meals(meals_section, data.get("meals", []))
+                    elif event.get("stage") == "stay":
+                        render_stays(stays_section, data.get("stays", {}))
+                elif event.get("event") == "done":
+                    render_itinerary(itinerary_section, data.get("itinerary", []))
+                    render_meals(meals_section, data.get("meals", []))
+                    render_stays(stays_section, data.get("stays", {}))
+                    status.success("Your travel plan is ready!")
+                elif event.get("event") == "error":
+                    error = data.get("error", {})
+                    status.error(f"An error occurred: {error.get('message', error)}")
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")